@@ -5,13 +5,16 @@ import json
 import time
 import math
 import base64
+import hashlib
 import requests
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Optional, Tuple, List
 import numpy as np
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 # Forecasting imports with graceful fallbacks
 try:
     from prophet import Prophet
@@ -32,6 +35,11 @@ from sklearn.model_selection import TimeSeriesSplit
 import plotly.express as px
 import plotly.graph_objects as go
 
+from climate_http import AIR_QUALITY_URL, http_get
+from climate_geocode import geocode
+from climate_forecast import PackedForest, lag_matrix, recursive_forecast
+from climate_store import empty_daily, grid_cell, load_daily, load_daily_many
+
 # SustainifyAI — Sustainability & Climate Change Tracker (All‑in‑One Streamlit App)
 # ---------------------------------------------------------------------------------
 # ✅ Final Version: Premium UI, Live Data, AI Forecasts, Universal Explanations,
@@ -435,23 +443,44 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 # --------------------------------------------------------------------------------------------------
 
+# ------------------------------ Utility: Concurrency ------------------------------
+def run_concurrently(jobs: dict, max_workers: int = 8) -> dict:
+    """
+    Run {name: (fn, *args)} on a thread pool and return {name: (result, error)}.
+    Workers share the script context so cached functions behave as on the main
+    thread; errors are returned, not raised, so each source reports its own.
+    """
+    ctx = get_script_run_ctx()
+
+    def call(fn, *args):
+        add_script_run_ctx(ctx=ctx)
+        return fn(*args)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as pool:
+        futures = {name: pool.submit(call, *job) for name, job in jobs.items()}
+        for name, fut in futures.items():
+            try:
+                results[name] = (fut.result(), None)
+            except Exception as e:
+                results[name] = (None, e)
+    return results
+
 # ------------------------------ Utility: Caching ------------------------------
-@st.cache_data(show_spinner=False)
 def geocode_place(place: str) -> Optional[Tuple[float, float, str, str]]:
-    """Use Open‑Meteo geocoding (no API key) to resolve a place to (lat, lon, name, country)."""
-    url = "https://geocoding-api.open-meteo.com/v1/search"
-    r = requests.get(url, params={"name": place, "count": 1, "language": "en", "format": "json"}, timeout=20)
-    if r.ok:
-        js = r.json()
-        if js.get("results"):
-            res = js["results"][0]
-            return float(res["latitude"]), float(res["longitude"]), res.get("name",""), res.get("country","")
-    return None
+    """
+    Resolve a place to (lat, lon, name, country) through the persistent geocode
+    index (climate_geocode.py): common Indian cities resolve offline, other names
+    hit Open‑Meteo geocoding once and are remembered across restarts.
+    """
+    return geocode(place)
 
-@st.cache_data(show_spinner=False)
+@st.cache_data(ttl=3600, show_spinner=False)
 def fetch_openmeteo_daily(lat: float, lon: float, start: dt.date, end: dt.date) -> pd.DataFrame:
     """
     Fetch daily climate variables from Open‑Meteo ERA5 reanalysis (no key).
+    Served from the local ERA5 store (climate_store.py): only dates it lacks are
+    downloaded, so moving the end date by a day costs one small request.
     """
     
     today_date = dt.date.today()
@@ -464,33 +493,44 @@ def fetch_openmeteo_daily(lat: float, lon: float, start: dt.date, end: dt.date)
 
     if api_end_date < start:
         # Return empty data frame with expected columns if period is invalid
-        return pd.DataFrame({'time': [], 'temperature_2m_max': [], 'temperature_2m_mean': [], 'temperature_2m_min': [], 'precipitation_sum': [], 'windspeed_10m_max': [], 'shortwave_radiation_sum': []})
+        return empty_daily()
 
-    url = "https://archive-api.open-meteo.com/v1/era5"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": start.isoformat(),
-        "end_date": api_end_date.isoformat(), # Use the adjusted end date
-        "daily": [
-            "temperature_2m_mean","temperature_2m_max","temperature_2m_min",
-            "precipitation_sum","windspeed_10m_max","shortwave_radiation_sum",
-        ],
-        "timezone": "auto",
-    }
-    r = requests.get(url, params=params, timeout=30)
-    r.raise_for_status() 
-    js = r.json()
-    df = pd.DataFrame(js["daily"])
-    df["time"] = pd.to_datetime(df["time"])
-    return df
+    return load_daily(lat, lon, start, api_end_date) # Use the adjusted end date
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_cities_daily(places: Tuple[str, ...], start: dt.date, end: dt.date) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Bulk mode: geocode many places concurrently, then pull their ERA5 history
+    through shared multi-coordinate requests (see climate_store.load_daily_many).
+    Returns one long-format frame (a row per location and day) and the places
+    that could not be geocoded.
+    """
+    geo = run_concurrently({place: (geocode_place, place) for place in places})
+    found = {place: res for place, (res, err) in geo.items() if err is None and res is not None}
+    failed = [place for place in places if place not in found]
+
+    # Same archive lag rule as fetch_openmeteo_daily
+    api_end_date = min(end, dt.date.today() - dt.timedelta(days=1))
+    by_cell = load_daily_many([(lat, lon) for lat, lon, _, _ in found.values()], start, api_end_date)
+
+    frames = []
+    for lat, lon, name, country in found.values():
+        df = by_cell[grid_cell(lat, lon)].copy()
+        df.insert(0, "location", f"{name}, {country}")
+        df.insert(1, "lat", lat)
+        df.insert(2, "lon", lon)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=["location", "lat", "lon"] + list(empty_daily().columns)), failed
+    df_all = pd.concat(frames, ignore_index=True).drop_duplicates(["location", "time"])
+    return df_all, failed
 
 @st.cache_data(show_spinner=False)
 def fetch_air_quality_current(lat: float, lon: float) -> pd.DataFrame:
     """
     Fetch latest air quality using Open-Meteo's Air Quality API (No key required).
+    Request errors propagate so a failed pull is not cached as an empty frame.
     """
-    url = "https://air-quality-api.open-meteo.com/v1/air-quality"
     hourly_vars = ["pm10", "pm2_5", "carbon_monoxide", "nitrogen_dioxide", "sulphur_dioxide", "ozone"]
     
     params = {
@@ -502,13 +542,9 @@ def fetch_air_quality_current(lat: float, lon: float) -> pd.DataFrame:
         "current": ",".join(hourly_vars)
     }
 
-    try:
-        r = requests.get(url, params=params, timeout=30)
-        r.raise_for_status()
-        js = r.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Air Quality API (Open-Meteo) fetch failed: {e}")
-        return pd.DataFrame()
+    r = http_get(AIR_QUALITY_URL, params=params, timeout=30)
+    r.raise_for_status()
+    js = r.json()
 
     rows = []
     if "current" in js and "hourly_units" in js:
@@ -688,103 +724,93 @@ def compute_sustainability_score(inp: SustainabilityInputs) -> Tuple[float, dict
 
 # ------------------------------ Forecasting Helpers ------------------------------
 
-def backtest_train_forecast(df: pd.DataFrame, target_col: str, horizon: int = 30, model_choice: str = "auto"):
-    """Time‑series train/validation split, fit model, forecast horizon days. Returns forecast and metrics."""
+def forecast_window(df: pd.DataFrame, target_col: str) -> pd.DataFrame:
+    """Sorted (ds, y) series of the target."""
     ts = df[["time", target_col]].dropna().copy()
     ts = ts.sort_values("time")
     ts.rename(columns={"time":"ds", target_col:"y"}, inplace=True)
+    return ts
 
-    # Use last 20% as validation
-    n = len(ts)
-    if n < 100:
-        # Small set: reduce horizon
-        horizon = max(7, min(horizon, n//5))
-    split_idx = max(5, int(n*0.8))
-    train, valid = ts.iloc[:split_idx], ts.iloc[split_idx:]
+def split_window(ts: pd.DataFrame):
+    """Use last 20% as validation."""
+    split_idx = max(5, int(len(ts)*0.8))
+    return ts.iloc[:split_idx], ts.iloc[split_idx:]
 
-    y_pred = None
+def window_hash(ts: pd.DataFrame) -> str:
+    """Fingerprint of a training window (dates and values) for the fitted-model cache."""
+    h = hashlib.sha1(ts["ds"].values.astype("datetime64[ns]").tobytes())
+    h.update(ts["y"].values.astype(np.float64).tobytes())
+    return h.hexdigest()
 
-    def prophet_fit_forecast():
-        m = Prophet(seasonality_mode='additive', yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
-        m.fit(train)
-        future = m.make_future_dataframe(periods=horizon)
-        fcst = m.predict(future)
-        return m, fcst
-
-    def arima_fit_forecast():
-        model = auto_arima(train["y"], seasonal=True, m=365, suppress_warnings=True)
-        # Build future index
-        full = pd.concat([train, valid], axis=0)
-        steps = horizon
-        preds = model.predict_in_sample(start=0, end=len(full)-1)
-        future_preds = model.predict(n_periods=steps)
-        fcst = pd.DataFrame({
-            "ds": pd.date_range(full["ds"].iloc[-1] + pd.Timedelta(days=1), periods=steps, freq='D'),
-            "yhat": future_preds
-        })
-        return model, fcst
-
-    def ml_fit_forecast():
-        # Simple lag features RF
-        full = pd.concat([train, valid], axis=0).reset_index(drop=True)
-        for lag in [1,2,7,14,30]:
-            full[f"lag_{lag}"] = full["y"].shift(lag)
-        full.dropna(inplace=True)
-        X = full.drop(columns=["ds","y"]).values
-        y = full["y"].values
-        split = int(len(full)*0.8)
-        Xtr, Xva = X[:split], X[split:]
-        ytr, yva = y[:split], y[split:]
-        rf = RandomForestRegressor(n_estimators=400, random_state=42)
-        rf.fit(Xtr, ytr)
-        # backtest pred
-        y_pred_bt = rf.predict(Xva)
-        # iterative future forecast using last row
-        last = full.iloc[-1:].copy()
-        future_rows = []
-        for i in range(horizon):
-            feats = last.drop(columns=["ds","y"]).values
-            yhat = rf.predict(feats)[0]
-            new_date = last["ds"].iloc[0] + pd.Timedelta(days=1)
-            row = {
-                "ds": new_date,
-                "y": np.nan,
-            }
-            # shift lags
-            for lag in [1,2,7,14,30]:
-                if lag == 1:
-                    row[f"lag_{lag}"] = yhat
-                else:
-                    row[f"lag_{lag}"] = last[f"lag_{lag-1}"] if f"lag_{lag-1}" in last else yhat
-            future_rows.append(row)
-            last = pd.DataFrame([row])
-        fcst = pd.DataFrame(future_rows)
-        fcst.rename(columns={"y": "yhat"}, inplace=True)
-        return rf, fcst, y_pred_bt, yva
-
-    model_used = None
+@st.cache_resource(max_entries=32, show_spinner=False)
+def fit_forecast_model(location: str, target_col: str, model_choice: str, window_key: str, _ts: pd.DataFrame):
+    """
+    Fit the forecast model once per (location, target, model choice, training
+    window hash); horizon changes reuse it and only extend the predictions.
+    The RF fits its trees on every core. Returns (model_used, fitted state, metrics).
+    """
+    ts = _ts
+    train, valid = split_window(ts)
     metrics = {"MAE": None, "MAPE": None}
 
     if (model_choice == "Prophet" and _HAS_PROPHET) or (model_choice == "auto" and _HAS_PROPHET):
-        model_used = "Prophet"
-        m, fcst = prophet_fit_forecast()
+        m = Prophet(seasonality_mode='additive', yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False)
+        m.fit(train)
         # validation on valid segment
         yhat_valid = m.predict(valid[["ds"]])["yhat"].values
         metrics["MAE"] = float(mean_absolute_error(valid["y"].values, yhat_valid))
         metrics["MAPE"] = float(mean_absolute_percentage_error(valid["y"].values, yhat_valid))
-    elif (model_choice == "ARIMA" and _HAS_ARIMA) or (model_choice == "auto" and _HAS_ARIMA):
-        model_used = "ARIMA"
-        m, fcst = arima_fit_forecast()
+        return "Prophet", m, metrics
+
+    if (model_choice == "ARIMA" and _HAS_ARIMA) or (model_choice == "auto" and _HAS_ARIMA):
+        # Stepwise order search. Seasonal orders stop at 1: with m=365 every
+        # seasonal term adds a year of lags to the state, and a single such fit
+        # already takes minutes, so an exhaustive search (~100 fits) never ends.
+        model = auto_arima(train["y"], seasonal=True, m=365, stepwise=True, max_P=1, max_Q=1, suppress_warnings=True)
         # No direct valid preds; approximate using last portion of in-sample + known
-        metrics["MAE"] = None
-        metrics["MAPE"] = None
+        return "ARIMA", model, metrics
+
+    # Lag features RF (lags 1, 2, 7, 14, 30 from a strided window view)
+    X, y = lag_matrix(ts["y"].values)
+    split = int(len(X)*0.8)
+    Xtr, Xva = X[:split], X[split:]
+    ytr, yva = y[:split], y[split:]
+    rf = RandomForestRegressor(n_estimators=400, random_state=42, n_jobs=-1)
+    rf.fit(Xtr, ytr)
+    # backtest pred
+    y_pred_bt = rf.predict(Xva)
+    metrics["MAE"] = float(mean_absolute_error(yva, y_pred_bt))
+    metrics["MAPE"] = float(mean_absolute_percentage_error(yva, y_pred_bt))
+    # Pack the trees once; every horizon reuses them
+    return "ML Ensemble", PackedForest(rf), metrics
+
+def extend_forecast(model_used: str, fitted, ts: pd.DataFrame, horizon: int) -> pd.DataFrame:
+    """Forecast `horizon` days from a fitted model (cheap next to fitting)."""
+    if model_used == "Prophet":
+        future = fitted.make_future_dataframe(periods=horizon)
+        return fitted.predict(future)
+
+    # Build future index
+    future_idx = pd.date_range(ts["ds"].iloc[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    if model_used == "ARIMA":
+        yhat = fitted.predict(n_periods=horizon)
     else:
-        model_used = "ML Ensemble"
-        m, fcst, y_pred_bt, y_valid = ml_fit_forecast()
-        metrics["MAE"] = float(mean_absolute_error(y_valid, y_pred_bt))
-        metrics["MAPE"] = float(mean_absolute_percentage_error(y_valid, y_pred_bt))
+        # recursive future forecast: each prediction feeds the next day's lags
+        # through a ring buffer, on a packed copy of the forest (NumPy only)
+        yhat = recursive_forecast(fitted, ts["y"].values, horizon)
+    return pd.DataFrame({"ds": future_idx, "yhat": np.asarray(yhat)})
+
+def backtest_train_forecast(df: pd.DataFrame, target_col: str, horizon: int = 30, model_choice: str = "auto", location: str = ""):
+    """Time‑series train/validation split, fit model, forecast horizon days. Returns forecast and metrics."""
+    ts = forecast_window(df, target_col)
+    train, valid = split_window(ts)
+    if len(ts) < 100:
+        # Small set: reduce horizon
+        horizon = max(7, min(horizon, len(ts)//5))
 
-    return model_used, ts, train, valid, fcst, metrics
+    model_used, fitted, metrics = fit_forecast_model(location, target_col, model_choice, window_hash(ts), ts)
+    fcst = extend_forecast(model_used, fitted, ts, horizon)
+    return model_used, ts, train, valid, fcst, dict(metrics)
 
 # ------------------------------ Alerts (Telegram Optional) ------------------------------
 
@@ -840,6 +866,16 @@ with st.sidebar.expander("Sustainability score inputs (optional overrides)"):
     water_idx = st.slider("Water quality index (%)", 0, 100, 65)
     recycle = st.slider("Waste recycling rate (%)", 0, 100, 30)
 
+with st.sidebar.expander("🏙 Compare cities (bulk mode)"):
+    bulk_text = st.text_area(
+        "Places to compare",
+        value="",
+        placeholder="Delhi\nMumbai\nVaranasi, Uttar Pradesh",
+        help="One place per line (or separated by ';'); 'City, Region' counts as one place. "
+             "Shown in the 'Compare Cities' tab for the selected period."
+    )
+bulk_places = tuple(dict.fromkeys(p.strip() for p in bulk_text.replace(";", "\n").splitlines() if p.strip()))
+
 # ------------------------------ Header (Cinematic) ------------------------------
 colA, colB = st.columns([0.7,0.3])
 with colA:
@@ -870,16 +906,24 @@ st.markdown(
 )
 
 # ------------------------------ Data Pulls ------------------------------
-with st.spinner("Fetching climate history (Open‑Meteo ERA5)…"):
-    try:
+# Both sources only need the geocoded coordinates, so they are issued together:
+# the page waits for the slowest call rather than the sum of both.
+with st.spinner("Fetching climate history (Open‑Meteo ERA5) and latest air quality (Open-Meteo AQ)…"):
+    pulls = run_concurrently({
         # fetch_openmeteo_daily now handles the end date logic to prevent 400 errors
-        df_clim = fetch_openmeteo_daily(lat, lon, start_date, end_date)
-    except Exception as e:
-        st.error(f"Open‑Meteo fetch failed: {e}")
-        st.stop()
-
-with st.spinner("Fetching latest air quality (Open-Meteo AQ)…"):
-    df_aq = fetch_air_quality_current(lat=lat, lon=lon)
+        "climate": (fetch_openmeteo_daily, lat, lon, start_date, end_date),
+        "air_quality": (fetch_air_quality_current, lat, lon),
+    })
+
+df_aq, aq_error = pulls["air_quality"]
+if aq_error is not None:
+    st.error(f"Air Quality API (Open-Meteo) fetch failed: {aq_error}")
+    df_aq = pd.DataFrame()
+
+df_clim, clim_error = pulls["climate"]
+if clim_error is not None:
+    st.error(f"Open‑Meteo fetch failed: {clim_error}")
+    st.stop()
 
 # ------------------------------ KPIs (Custom Integrated Style) ------------------------------
 
@@ -940,8 +984,8 @@ if alerts:
         st.success("Sent Telegram alert ✅")
 
 # ------------------------------ Tabs ------------------------------
-TAB_OVERVIEW, TAB_AIR, TAB_TRENDS, TAB_FORECAST, TAB_FUTURE, TAB_SCORE, TAB_CARBON, TAB_ABOUT = st.tabs([
-    "Overview", "Air Quality", "Climate Trends", "Forecasts", "Future Impact", "Sustainability Score", "Personal Carbon", "About Project 🚀"
+TAB_OVERVIEW, TAB_AIR, TAB_TRENDS, TAB_COMPARE, TAB_FORECAST, TAB_FUTURE, TAB_SCORE, TAB_CARBON, TAB_ABOUT = st.tabs([
+    "Overview", "Air Quality", "Climate Trends", "Compare Cities", "Forecasts", "Future Impact", "Sustainability Score", "Personal Carbon", "About Project 🚀"
 ])
 
 with TAB_OVERVIEW:
@@ -1270,6 +1314,62 @@ with TAB_TRENDS:
     # ------------------- END HINGLISH EXPLANATION -------------------
 
 
+with TAB_COMPARE:
+    st.subheader("Multi‑city Climate Comparison")
+    if not bulk_places:
+        st.info("Add places under **🏙 Compare cities (bulk mode)** in the sidebar to compare them here.")
+    else:
+        with st.spinner(f"Fetching climate history for {len(bulk_places)} places (Open‑Meteo ERA5)…"):
+            try:
+                df_cities, bulk_failed = fetch_cities_daily(bulk_places, start_date, end_date)
+            except Exception as e:
+                st.error(f"Open‑Meteo bulk fetch failed: {e}")
+                df_cities, bulk_failed = pd.DataFrame(), []
+
+        if bulk_failed:
+            st.warning("Couldn't geocode: " + ", ".join(bulk_failed))
+
+        if not df_cities.empty:
+            years = max((df_cities["time"].max() - df_cities["time"].min()).days / 365.25, 1 / 365.25)
+            df_summary = df_cities.groupby("location").agg(
+                Avg_Temp=("temperature_2m_mean", "mean"),
+                Hottest_Day=("temperature_2m_max", "max"),
+                Coldest_Night=("temperature_2m_min", "min"),
+                Total_Precip=("precipitation_sum", "sum"),
+                Max_Wind=("windspeed_10m_max", "max"),
+            ).reset_index()
+            df_summary["Annual_Precip"] = df_summary.pop("Total_Precip") / years
+            df_summary = df_summary.sort_values("Avg_Temp", ascending=False).round(1)
+            st.dataframe(df_summary.rename(columns={
+                "location": "Location", "Avg_Temp": "Avg Temp (°C)", "Hottest_Day": "Hottest Day (°C)",
+                "Coldest_Night": "Coldest Night (°C)", "Max_Wind": "Max Wind (km/h)", "Annual_Precip": "Precip / Year (mm)",
+            }), use_container_width=True, hide_index=True)
+
+            # Monthly means keep 50+ lines readable
+            df_month = (
+                df_cities.set_index("time").groupby("location")["temperature_2m_mean"]
+                .resample("MS").mean().reset_index()
+            )
+            fig = px.line(df_month, x="time", y="temperature_2m_mean", color="location",
+                          title="*Monthly Mean Temperature by Location*")
+            fig.update_layout(
+                height=460,
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                font=dict(color='#c9d7ee'),
+                xaxis_title="Month",
+                yaxis_title="Mean Temperature (°C)",
+                xaxis=dict(tickfont=dict(color='#e8f0fe')),
+                yaxis=dict(tickfont=dict(color='#e8f0fe'))
+            )
+            st.markdown('<div class="plot-wrap">', unsafe_allow_html=True)
+            st.plotly_chart(fig, use_container_width=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+            st.download_button("⬇ Download Multi‑city CSV (long format)", data=df_cities.to_csv(index=False),
+                               file_name="climate_multi_city.csv", mime="text/csv")
+
+
 with TAB_FORECAST:
     st.subheader("AI Forecasts with Backtest Metrics")
     target = st.selectbox(
@@ -1281,7 +1381,7 @@ with TAB_FORECAST:
     )
     horizon = st.slider("Forecast horizon (days)", 7, 365, 90)
 
-    model_used, ts, train, valid, fcst, metrics = backtest_train_forecast(df_clim[["time", target]].dropna(), target, horizon=horizon, model_choice=model_choice)
+    model_used, ts, train, valid, fcst, metrics = backtest_train_forecast(df_clim[["time", target]].dropna(), target, horizon=horizon, model_choice=model_choice, location=f"{lat:.4f},{lon:.4f}")
 
     st.info(f"Model used: *{model_used}* |  MAE: *{metrics['MAE'] if metrics['MAE'] is not None else '—'}* |  MAPE: *{metrics['MAPE'] if metrics['MAPE'] is not None else '—'}*")
 
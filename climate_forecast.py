@@ -0,0 +1,81 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Vectorized lag-feature forecasting for ClimateAI's "ML Ensemble" model.
+# ---------------------------------------------------------------------------------
+# Lag features come from one strided window view over the series instead of a
+# DataFrame shift per lag. Forecasting stays recursive (tomorrow's lag_1 is
+# today's prediction) but runs on NumPy only: the fitted forest is packed into
+# flat node arrays so a feature row walks all trees at once, one gather per tree
+# level, and the lags are read from a ring buffer of recent values. A 365-day
+# forecast takes a few dozen milliseconds instead of hundreds of rf.predict calls
+# on one-row DataFrames.
+# ---------------------------------------------------------------------------------
+
+LAGS = (1, 2, 7, 14, 30)
+
+
+def lag_matrix(y: np.ndarray, lags=LAGS):
+    """
+    Features and targets for one-step-ahead training: row i holds y[t - lag] for
+    each lag, with target y[t], for t = max(lags) .. len(y) - 1.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    w = max(lags)
+    if len(y) <= w:
+        return np.empty((0, len(lags))), np.empty(0)
+    windows = sliding_window_view(y[:-1], w)           # windows[i] = y[i : i + w]
+    X = windows[:, [w - lag for lag in lags]]          # y[i + w - lag], a copy
+    return X, y[w:]
+
+
+class PackedForest:
+    """A fitted RandomForestRegressor's trees as flat arrays for fast single-row prediction."""
+
+    def __init__(self, forest):
+        trees = [est.tree_ for est in forest.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees[:-1]])
+        self.roots = offsets.astype(np.intp)
+        # children[2 * node + go_right]; leaves point at themselves, so a tree
+        # that has already landed stays put while deeper trees keep walking.
+        children = []
+        for t, off in zip(trees, offsets):
+            own = np.arange(t.node_count) + off
+            left = np.where(t.children_left >= 0, t.children_left + off, own)
+            right = np.where(t.children_right >= 0, t.children_right + off, own)
+            children.append(np.stack([left, right], axis=1).ravel())
+        self.children = np.concatenate(children).astype(np.intp)
+        self.feature = np.concatenate([np.maximum(t.feature, 0) for t in trees]).astype(np.intp)
+        self.threshold = np.concatenate([t.threshold for t in trees])
+        self.value = np.concatenate([t.value[:, 0, 0] for t in trees])
+        self.depth = max(t.max_depth for t in trees)
+
+    def predict_one(self, x: np.ndarray) -> float:
+        """Mean of all trees' leaves for one feature row."""
+        x = np.asarray(x, dtype=np.float32)   # sklearn splits on float32 features
+        node = self.roots
+        for level in range(self.depth):
+            nxt = self.children[2 * node + (x[self.feature[node]] > self.threshold[node])]
+            if level % 4 == 3 and np.array_equal(nxt, node):
+                break
+            node = nxt
+        return float(self.value[node].mean())
+
+
+def recursive_forecast(forest, history: np.ndarray, horizon: int, lags=LAGS) -> np.ndarray:
+    """
+    Predict `horizon` steps past the end of `history`, feeding each prediction
+    back as the next step's lag_1 (and lag_k once it is k steps old).
+    """
+    packed = forest if isinstance(forest, PackedForest) else PackedForest(forest)
+    w = max(lags)
+    ring = np.asarray(history, dtype=np.float64)[-w:].copy()   # ring[pos % w] is the oldest value
+    lag_idx = np.asarray(lags, dtype=np.intp)
+    out = np.empty(horizon)
+    for step in range(horizon):
+        pos = step % w
+        # The value `lag` steps back sits at (pos - lag) mod w in the ring.
+        yhat = packed.predict_one(ring[(pos - lag_idx) % w])
+        ring[pos] = yhat
+        out[step] = yhat
+    return out
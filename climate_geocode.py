@@ -0,0 +1,152 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import unicodedata
+from contextlib import closing, contextmanager
+from typing import Optional, Tuple
+from urllib.request import pathname2url
+
+import requests
+
+from climate_http import GEOCODING_URL, http_get
+
+# Persistent geocode index.
+# ---------------------------------------------------------------------------------
+# Place lookups go through a small SQLite table keyed by a normalized name
+# ("  Varanasi, U.P. " -> "varanasi u p"), so spellings that differ only in
+# case, accents or punctuation share one row and survive restarts. The table
+# is seeded with the cities get_tree_inventory knows, so those resolve offline;
+# anything else hits the geocoding API once and is written back under both the
+# typed and the returned name.
+# ---------------------------------------------------------------------------------
+
+GEOCODE_DB = os.getenv("CLIMATE_GEOCODE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.sqlite3"))
+
+Place = Tuple[float, float, str, str]   # (lat, lon, name, country)
+
+# GeoNames coordinates for the cities with tree/population proxies in ClimateAI.
+GAZETTEER = {
+    "delhi": (28.65195, 77.23149, "Delhi", "India"),
+    "mumbai": (19.07283, 72.88261, "Mumbai", "India"),
+    "bengaluru": (12.97194, 77.59369, "Bengaluru", "India"),
+    "chennai": (13.08784, 80.27847, "Chennai", "India"),
+    "kanpur": (26.46523, 80.34975, "Kanpur", "India"),
+    "lucknow": (26.83928, 80.92313, "Lucknow", "India"),
+    "ghaziabad": (28.66535, 77.43915, "Ghaziabad", "India"),
+    "agra": (27.18333, 78.01667, "Agra", "India"),
+    "varanasi": (25.31668, 83.01041, "Varanasi", "India"),
+    "meerut": (28.98002, 77.70636, "Meerut", "India"),
+    "bareilly": (28.34702, 79.42193, "Bareilly", "India"),
+    "aligarh": (27.88145, 78.07464, "Aligarh", "India"),
+    "moradabad": (28.83893, 78.77684, "Moradabad", "India"),
+    "firozabad": (27.15092, 78.39781, "Firozabad", "India"),
+    "jhansi": (25.45446, 78.58221, "Jhansi", "India"),
+    "gorakhpur": (26.76628, 83.36889, "Gorakhpur", "India"),
+    "prayagraj": (25.44478, 81.84322, "Prayagraj", "India"),
+    "allahabad": (25.44478, 81.84322, "Prayagraj", "India"),
+}
+
+_readers = {}   # DB path -> idle read-only connections; present once the table holds the gazetteer
+_prepare_lock = threading.Lock()
+
+
+def normalize_place(place: str) -> str:
+    """Lowercase, strip accents and collapse punctuation/whitespace."""
+    text = unicodedata.normalize("NFKD", place).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _prepare(path: str):
+    # Schema and gazetteer rows are written once per DB path and process, not
+    # by every thread that looks a place up.
+    with _prepare_lock:
+        if path in _readers:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with closing(sqlite3.connect(path, timeout=30)) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS places ("
+                " key TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL,"
+                " name TEXT NOT NULL, country TEXT NOT NULL, source TEXT NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO places VALUES (?, ?, ?, ?, ?, 'gazetteer')",
+                    [(key, *place) for key, place in GAZETTEER.items()],
+                )
+        _readers[path] = queue.SimpleQueue()
+
+
+@contextmanager
+def _reader():
+    # Bulk geocoding runs on a fresh thread pool each time, so connections are
+    # pooled per DB path rather than per thread: there are never more than the
+    # peak number of concurrent lookups, and they outlive the pools.
+    path = GEOCODE_DB
+    _prepare(path)
+    idle = _readers[path]
+    try:
+        conn = idle.get_nowait()
+    except queue.Empty:
+        conn = sqlite3.connect(f"file:{pathname2url(path)}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+    try:
+        yield conn
+    finally:
+        idle.put(conn)
+
+
+def _writer() -> sqlite3.Connection:
+    # Writes only follow a network fetch, so they take a connection of their own.
+    _prepare(GEOCODE_DB)
+    return sqlite3.connect(GEOCODE_DB, timeout=30)
+
+
+def lookup(place: str) -> Optional[Place]:
+    """Cached coordinates for a place, or None on a miss."""
+    with _reader() as conn:
+        row = conn.execute("SELECT lat, lon, name, country FROM places WHERE key = ?", (normalize_place(place),)).fetchone()
+        if row is None and "," in place:
+            # "Varanasi, Uttar Pradesh": fall back to a gazetteer city, never to another
+            # API answer (a cached "Paris" says nothing about "Paris, Texas").
+            row = conn.execute(
+                "SELECT lat, lon, name, country FROM places WHERE key = ? AND source = 'gazetteer'",
+                (normalize_place(place.split(",", 1)[0]),),
+            ).fetchone()
+    return row
+
+
+def remember(place: str, result: Place):
+    """Store an API answer under the typed name, and under the returned name unless that is taken."""
+    with closing(_writer()) as conn, conn:
+        conn.execute("INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, 'api')", (normalize_place(place), *result))
+        if normalize_place(result[2]):
+            conn.execute("INSERT OR IGNORE INTO places VALUES (?, ?, ?, ?, ?, 'api')", (normalize_place(result[2]), *result))
+
+
+def fetch_geocode(place: str) -> Optional[Place]:
+    """Use Open‑Meteo geocoding (no API key) to resolve a place to (lat, lon, name, country)."""
+    r = http_get(GEOCODING_URL, params={"name": place, "count": 1, "language": "en", "format": "json"}, timeout=20)
+    if r.ok:
+        js = r.json()
+        if js.get("results"):
+            res = js["results"][0]
+            return float(res["latitude"]), float(res["longitude"]), res.get("name",""), res.get("country","")
+    return None
+
+
+def geocode(place: str) -> Optional[Place]:
+    """Index first; the network only on a miss, with the answer written back. Offline misses give None."""
+    hit = lookup(place)
+    if hit is not None:
+        return hit
+    try:
+        result = fetch_geocode(place)
+    except requests.exceptions.RequestException:
+        return None
+    if result is not None:
+        remember(place, result)
+    return result
@@ -0,0 +1,94 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Shared HTTP layer for ClimateAI's Open-Meteo calls.
+# ---------------------------------------------------------------------------------
+# One process-wide requests.Session keeps TCP/TLS connections alive between
+# calls (and between Streamlit reruns, since the module stays imported),
+# retries 429/5xx with exponential backoff (honouring Retry-After), and caps
+# how many requests run against the same host at once.
+# ---------------------------------------------------------------------------------
+
+# ------------------------------ Endpoints ------------------------------
+# Point these at a local stub server to run the app without the real APIs.
+GEOCODING_URL = os.getenv("OPENMETEO_GEOCODING_URL", "https://geocoding-api.open-meteo.com/v1/search")
+ARCHIVE_URL = os.getenv("OPENMETEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/era5")
+AIR_QUALITY_URL = os.getenv("OPENMETEO_AIR_QUALITY_URL", "https://air-quality-api.open-meteo.com/v1/air-quality")
+
+# ------------------------------ Pool Settings ------------------------------
+POOL_SIZE = int(os.getenv("CLIMATE_HTTP_POOL_SIZE", "8"))            # kept-alive connections per host
+HOST_CONCURRENCY = int(os.getenv("CLIMATE_HTTP_HOST_CONCURRENCY", "4"))
+RETRIES = int(os.getenv("CLIMATE_HTTP_RETRIES", "3"))
+BACKOFF = float(os.getenv("CLIMATE_HTTP_BACKOFF", "0.5"))            # 0.5s, 1s, 2s, ...
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_host_slots = {}
+
+
+def make_session(pool_size: int = POOL_SIZE, retries: int = RETRIES, backoff: float = BACKOFF) -> requests.Session:
+    """Build a pooled session that retries idempotent requests on 429/5xx and connection errors."""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        # Hand the last 429/5xx back so callers' raise_for_status() reports it.
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = "SustainifyAI/1.0"
+    return session
+
+
+def get_session() -> requests.Session:
+    """The process-wide session, created on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = make_session()
+    return _session
+
+
+def reset_session():
+    """Close pooled connections (e.g. after changing the settings above)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _host_slots.clear()
+
+
+@contextmanager
+def host_slot(url: str):
+    """Hold one of HOST_CONCURRENCY slots for the URL's host while a request runs."""
+    host = urlsplit(url).netloc
+    with _session_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(HOST_CONCURRENCY)
+    with slot:
+        yield
+
+
+def http_get(url: str, params: Optional[dict] = None, timeout: float = 30, **kwargs) -> requests.Response:
+    """GET through the shared pool; retries and backoff happen inside the host slot."""
+    with host_slot(url):
+        return get_session().get(url, params=params, timeout=timeout, **kwargs)
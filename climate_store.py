@@ -0,0 +1,165 @@
+import os
+import threading
+import datetime as dt
+import importlib.util
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from climate_http import ARCHIVE_URL, http_get
+
+# Local ERA5 daily store.
+# ---------------------------------------------------------------------------------
+# Daily history is kept on disk, one file per 0.25° grid cell (ERA5's native
+# resolution, so nearby coordinates share data) and calendar year. A request
+# reads the partitions it overlaps, downloads only the dates that are absent or
+# still null (ERA5 lags real time by a few days), writes them back and slices the
+# requested range. The usual daily refresh is therefore one request for the last
+# few days instead of five years of rows, and many cities share each request.
+# ---------------------------------------------------------------------------------
+
+STORE_DIR = os.getenv("CLIMATE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "era5_store"))
+GRID_DEG = 0.25
+DAILY_VARS = [
+    "temperature_2m_mean", "temperature_2m_max", "temperature_2m_min",
+    "precipitation_sum", "windspeed_10m_max", "shortwave_radiation_sum",
+]
+MERGE_GAP_DAYS = 30   # missing ranges closer than this are fetched in one request
+MULTI_COORDS = 50     # grid cells per multi-coordinate archive request
+PENDING_DAYS = 10     # nulls this recent are still filling in upstream; older ones are final
+_PARQUET = importlib.util.find_spec("pyarrow") is not None
+_EXT = ".parquet" if _PARQUET else ".csv"
+
+_cell_locks = {}
+_locks_guard = threading.Lock()
+
+
+def empty_daily() -> pd.DataFrame:
+    """Frame with the daily schema and no rows."""
+    df = pd.DataFrame({col: pd.Series(dtype="float64") for col in DAILY_VARS})
+    df.insert(0, "time", pd.Series(dtype="datetime64[ns]"))
+    return df
+
+
+def grid_cell(lat: float, lon: float) -> Tuple[float, float]:
+    """Snap a coordinate to the centre of its ERA5 grid cell."""
+    return round(round(lat / GRID_DEG) * GRID_DEG, 2), round(round(lon / GRID_DEG) * GRID_DEG, 2)
+
+
+def _cell_lock(cell: Tuple[float, float]) -> threading.Lock:
+    with _locks_guard:
+        return _cell_locks.setdefault(cell, threading.Lock())
+
+
+def _partition_path(cell: Tuple[float, float], year: int) -> str:
+    lat, lon = cell
+    return os.path.join(STORE_DIR, f"{lat:+.2f}_{lon:+.2f}", f"{year}{_EXT}")
+
+
+def _read_year(cell: Tuple[float, float], year: int) -> pd.DataFrame:
+    path = _partition_path(cell, year)
+    if not os.path.exists(path):
+        return empty_daily()
+    if _PARQUET:
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, parse_dates=["time"])
+    return df
+
+
+def _write_year(cell: Tuple[float, float], year: int, df: pd.DataFrame):
+    path = _partition_path(cell, year)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    if _PARQUET:
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)   # readers never see a half-written partition
+
+
+def missing_ranges(have: pd.DataFrame, start: dt.date, end: dt.date) -> List[Tuple[dt.date, dt.date]]:
+    """Date ranges in [start, end] with no stored row or a recent null, gaps under MERGE_GAP_DAYS merged."""
+    days = pd.date_range(start, end, freq="D")
+    pending = have[DAILY_VARS].isna().any(axis=1) & (have["time"] >= pd.Timestamp(dt.date.today() - dt.timedelta(days=PENDING_DAYS)))
+    complete = have.loc[~pending, "time"]
+    todo = days[~days.isin(complete)]
+    ranges = []
+    for day in todo.date:
+        if ranges and (day - ranges[-1][1]).days <= MERGE_GAP_DAYS:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [(s, e) for s, e in ranges]
+
+
+def _fetch_ranges(cells: List[Tuple[float, float]], start: dt.date, end: dt.date) -> List[pd.DataFrame]:
+    """One archive request for several grid cells; Open-Meteo answers a list in request order."""
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in cells),
+        "longitude": ",".join(str(lon) for _, lon in cells),
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "daily": DAILY_VARS,
+        "timezone": "auto",
+    }
+    r = http_get(ARCHIVE_URL, params=params, timeout=60)
+    r.raise_for_status()
+    js = r.json()
+    frames = []
+    for item in (js if isinstance(js, list) else [js]):
+        df = pd.DataFrame(item["daily"])
+        df["time"] = pd.to_datetime(df["time"])
+        for col in DAILY_VARS:
+            df[col] = pd.to_numeric(df.get(col), errors="coerce").astype("float64")
+        frames.append(df[["time"] + DAILY_VARS])
+    return frames
+
+
+def _read_cell(cell: Tuple[float, float], years: range) -> pd.DataFrame:
+    return pd.concat([_read_year(cell, year) for year in years], ignore_index=True)
+
+
+def _store_rows(cell: Tuple[float, float], rows: pd.DataFrame):
+    with _cell_lock(cell):
+        for year, part in rows.groupby(rows["time"].dt.year):
+            merged = pd.concat([_read_year(cell, year), part], ignore_index=True)
+            # Fresh rows win over stored ones (a null day that has since been filled in).
+            merged = merged.drop_duplicates("time", keep="last").sort_values("time", ignore_index=True)
+            _write_year(cell, year, merged)
+
+
+def load_daily_many(coords: List[Tuple[float, float]], start: dt.date, end: dt.date) -> Dict[Tuple[float, float], pd.DataFrame]:
+    """
+    Daily ERA5 history for [start, end] at several coordinates, keyed by grid cell.
+    Cells missing the same dates (the usual case: all new, or all one day behind)
+    share multi-coordinate requests of up to MULTI_COORDS cells each.
+    """
+    cells = list(dict.fromkeys(grid_cell(lat, lon) for lat, lon in coords))
+    if end < start:
+        return {cell: empty_daily() for cell in cells}
+    years = range(start.year, end.year + 1)
+    plan = {}
+    for cell in cells:
+        ranges = tuple(missing_ranges(_read_cell(cell, years), start, end))
+        if ranges:
+            plan.setdefault(ranges, []).append(cell)
+    for ranges, group in plan.items():
+        for i in range(0, len(group), MULTI_COORDS):
+            batch = group[i:i + MULTI_COORDS]
+            for s, e in ranges:
+                for cell, rows in zip(batch, _fetch_ranges(batch, s, e)):
+                    _store_rows(cell, rows)
+    out = {}
+    for cell in cells:
+        df = _read_cell(cell, years)
+        mask = (df["time"] >= pd.Timestamp(start)) & (df["time"] <= pd.Timestamp(end))
+        df = df.loc[mask].reset_index(drop=True)
+        df[DAILY_VARS] = df[DAILY_VARS].astype("float64")
+        out[cell] = df
+    return out
+
+
+def load_daily(lat: float, lon: float, start: dt.date, end: dt.date) -> pd.DataFrame:
+    """Daily ERA5 history for [start, end], downloading only what the store lacks."""
+    return load_daily_many([(lat, lon)], start, end)[grid_cell(lat, lon)]
@@ -0,0 +1,276 @@
+# ---------- IMPORTS ----------
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import personality_predictor as pp
+
+# Benchmark for the CV prediction pipeline.
+#
+#   python personality_benchmark.py --pages 1,10,50,100 --docs 20 --output bench.json
+#
+# Synthetic CVs of each page count are written to a temp directory, then every
+# stage (extract, preprocess, vectorize, predict) is timed on its own, one
+# document at a time ("single") and over the whole set at once ("batched").
+# Timings come from plain runs; peak memory comes from a separate pass under
+# tracemalloc, which would otherwise slow the timed runs down. Results are
+# written as JSON so runs can be diffed against each other.
+#
+# --large-pdf-mb additionally compares peak RSS of extracting one large PDF the
+# old way (PdfReader on the path, which reads the whole file into memory) with
+# the memory-mapped extractor, each in a fresh process.
+
+WORDS = sorted({word for text in pp.train_texts for word in pp.tokenize(text)}) + [
+    "python", "sql", "engineer", "analyst", "university", "internship", "experience",
+    "skills", "project", "client", "report", "customer", "sales", "support", "data",
+]
+LINES_PER_PAGE = 40
+WORDS_PER_LINE = 12
+
+# ---------- SYNTHETIC PDF ----------
+# A minimal PDF 1.4 writer: one Helvetica text block per page, no dependencies.
+# padding_bytes adds an unreferenced binary stream object, standing in for the
+# embedded images and fonts that make real uploads large.
+def write_synthetic_pdf(path, n_pages, rng, padding_bytes=0):
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for i in range(n_pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        lines = [" ".join(rng.choices(WORDS, k=WORDS_PER_LINE)) for _ in range(LINES_PER_PAGE)]
+        stream = ("BT /F1 10 Tf 14 TL 50 760 Td " + " ".join(f"({line}) '" for line in lines) + " ET").encode("ascii")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode("ascii")
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        kids.append(f"{page_id} 0 R")
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {n_pages} >>".encode("ascii")
+    if padding_bytes:
+        objects[4 + 2 * n_pages] = b"<< /Length %d >>\nstream\n%s\nendstream" % (
+            padding_bytes, os.urandom(padding_bytes))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (obj_id, objects[obj_id])
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for obj_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as fh:
+        fh.write(out)
+
+# ---------- MEASUREMENT ----------
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+def _peak_mb(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+def _summary(stage, mode, pages, latencies, docs, units=None):
+    total = sum(latencies)
+    row = {
+        "stage": stage,
+        "mode": mode,
+        "pages": pages,
+        "docs": docs,
+        "total_s": round(total, 6),
+        "docs_per_s": round(docs / total, 2) if total else None,
+        "latency_unit": "doc" if mode == "single" else "batch",
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+    }
+    if units:
+        row[f"{units[0]}_per_s"] = round(units[1] / total, 1) if total else None
+    return row
+
+_rss_mb = pp.peak_rss_mb
+
+def _extract_rss(path, mode):
+    from PyPDF2 import PdfReader
+
+    before = _rss_mb()
+    if mode == "read_into_memory":
+        reader = PdfReader(path)
+        n_chars = sum(len(page.extract_text() or "") for page in reader.pages)
+    else:
+        n_chars = len(pp.extract_text_from_pdf(path))
+    return {"before_mb": before, "peak_mb": _rss_mb(), "chars": n_chars}
+
+# ---------- STAGES ----------
+def bench_page_count(paths, pages, model, workers, repeat):
+    vectorizer, classifier = model[:-1], model[-1]
+    results = []
+
+    # Single-document path: each stage per document, latencies are per document.
+    latencies = {"extract": [], "preprocess": [], "vectorize": [], "predict": []}
+    for _ in range(repeat):
+        for path in paths:
+            text, t = _timed(pp.extract_text_from_pdf, path)
+            latencies["extract"].append(t)
+            tokens, t = _timed(pp.tokenize, text)
+            latencies["preprocess"].append(t)
+            X, t = _timed(vectorizer.transform, [tokens])
+            latencies["vectorize"].append(t)
+            _, t = _timed(classifier.predict, X)
+            latencies["predict"].append(t)
+    texts = [pp.extract_text_from_pdf(path) for path in paths]
+    docs = [pp.tokenize(text) for text in texts]
+    n_tokens = sum(len(tokens) for tokens in docs)
+    X = vectorizer.transform(docs)
+    n = len(paths) * repeat
+    peaks = {
+        "extract": _peak_mb(pp.extract_text_from_pdf, paths[0]),
+        "preprocess": _peak_mb(pp.tokenize, texts[0]),
+        "vectorize": _peak_mb(vectorizer.transform, docs[:1]),
+        "predict": _peak_mb(classifier.predict, X[:1]),
+    }
+    units = {"extract": ("pages", pages * n), "preprocess": ("tokens", n_tokens * repeat)}
+    for stage, values in latencies.items():
+        results.append({**_summary(stage, "single", pages, values, n, units.get(stage)),
+                        "peak_mb": round(peaks[stage], 3)})
+
+    # Long documents: the same extraction split across page-range workers.
+    # tracemalloc only sees this process, so the peak is the parent's side
+    # (collected page text); the workers' own memory is not included.
+    if pages >= pp.PARALLEL_MIN_PAGES:
+        values = [_timed(pp.extract_text_from_pdf, path, None, workers)[1]
+                  for _ in range(repeat) for path in paths]
+        peak = _peak_mb(pp.extract_text_from_pdf, paths[0], None, workers)
+        results.append({**_summary("extract_parallel", "single", pages, values, n, ("pages", pages * n)),
+                        "peak_mb": round(peak, 3)})
+
+    # Batched path: one call per stage over all documents, latency per call.
+    # "predict_batch" is the end-to-end batch entry point (process pool
+    # extraction plus one classifier call).
+    batched = {"predict_batch": [], "preprocess": [], "vectorize": [], "predict": []}
+    for _ in range(repeat):
+        _, t = _timed(pp.predict_batch, paths, workers)
+        batched["predict_batch"].append(t)
+        _, t = _timed(lambda: [pp.tokenize(text) for text in texts])
+        batched["preprocess"].append(t)
+        _, t = _timed(vectorizer.transform, docs)
+        batched["vectorize"].append(t)
+        _, t = _timed(classifier.predict, X)
+        batched["predict"].append(t)
+    peaks = {
+        "predict_batch": _peak_mb(pp.predict_batch, paths, 1),
+        "preprocess": _peak_mb(lambda: [pp.tokenize(text) for text in texts]),
+        "vectorize": _peak_mb(vectorizer.transform, docs),
+        "predict": _peak_mb(classifier.predict, X),
+    }
+    units = {"predict_batch": ("pages", pages * n), "preprocess": ("tokens", n_tokens * repeat)}
+    for stage, values in batched.items():
+        row = _summary(stage, "batched", pages, values, n, units.get(stage))
+        results.append({**row, "peak_mb": round(peaks[stage], 3)})
+    return results
+
+# Each mode runs in its own spawned process so one does not inherit the
+# other's high-water mark.
+def bench_large_pdf(size_mb, pages=10, seed=0):
+    import multiprocessing
+
+    rows = []
+    if _rss_mb() is None:
+        print("⚠️ No RSS reader on this platform (no /proc, no resource module); skipping the large-PDF rows")
+        return rows
+    with tempfile.TemporaryDirectory(prefix="cv-bench-") as tmp:
+        path = os.path.join(tmp, "large.pdf")
+        write_synthetic_pdf(path, pages, random.Random(seed), padding_bytes=int(size_mb * 1024 * 1024))
+        file_mb = os.path.getsize(path) / (1024 * 1024)
+        ctx = multiprocessing.get_context("spawn")
+        for mode in ("read_into_memory", "mmap"):
+            with ctx.Pool(1) as pool:
+                stats = pool.apply(_extract_rss, (path, mode))
+            rows.append({
+                "stage": "extract_large",
+                "mode": mode,
+                "pages": pages,
+                "file_mb": round(file_mb, 1),
+                "rss_before_mb": round(stats["before_mb"], 1),
+                "rss_peak_mb": round(stats["peak_mb"], 1),
+                "rss_delta_mb": round(stats["peak_mb"] - stats["before_mb"], 1),
+                "chars": stats["chars"],
+            })
+    return rows
+
+def run(page_counts, n_docs, repeat, workers, seed=0, large_pdf_mb=None):
+    import sklearn
+
+    rng = random.Random(seed)
+    model = pp.get_model()
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sklearn": sklearn.__version__,
+            "docs": n_docs,
+            "repeat": repeat,
+            "workers": workers,
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="cv-bench-") as tmp:
+        for pages in page_counts:
+            paths = []
+            for i in range(n_docs):
+                path = os.path.join(tmp, f"cv_{pages}p_{i}.pdf")
+                write_synthetic_pdf(path, pages, rng)
+                paths.append(path)
+            report["results"].extend(bench_page_count(paths, pages, model, workers, repeat))
+    max_rss_mb = _rss_mb()
+    if max_rss_mb is not None:
+        report["meta"]["max_rss_mb"] = round(max_rss_mb, 1)
+    if large_pdf_mb:
+        report["large_pdf"] = bench_large_pdf(large_pdf_mb, seed=seed)
+    return report
+
+# ---------- MAIN ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the CV personality prediction pipeline.")
+    parser.add_argument("--pages", default="1,10,50,100", help="comma-separated page counts")
+    parser.add_argument("--docs", type=int, default=20, help="synthetic CVs per page count")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size for the batched path")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--large-pdf-mb", type=float, default=50,
+                        help="size of the PDF for the peak RSS comparison (0 to skip)")
+    args = parser.parse_args()
+
+    report = run([int(p) for p in args.pages.split(",")], args.docs, args.repeat, args.workers,
+                 large_pdf_mb=args.large_pdf_mb)
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    for row in report["results"]:
+        peak = "n/a" if row.get("peak_mb") is None else f"{row['peak_mb']:.2f} MB"
+        print(f"{row['stage']:>22} {row['mode']:>7} {row['pages']:>4}p  "
+              f"p50 {row['p50_ms']:>9.3f} ms  p99 {row['p99_ms']:>9.3f} ms  "
+              f"{row['docs_per_s'] or 0:>10.1f} docs/s  peak {peak}")
+    for row in report.get("large_pdf", []):
+        print(f"{row['stage']:>22} {row['mode']:>16} {row['file_mb']:>6.1f} MB file  "
+              f"RSS +{row['rss_delta_mb']:.1f} MB (peak {row['rss_peak_mb']:.1f} MB)")
+    print(f"📈 Wrote {args.output}")
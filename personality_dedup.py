@@ -0,0 +1,87 @@
+# ---------- IMPORTS ----------
+from personality_predictor import analyze_tokens
+
+# ---------- DEDUP: MinHash / LSH ----------
+# Near-identical re-uploads are scored once. Each document (the token stream
+# preprocess_text joins) becomes a set of word shingles, hashed with crc32, and
+# gets a MinHash signature of num_perm universal hashes. Signatures are split
+# into `bands` bands; two documents sharing any band bucket are candidates,
+# and a candidate counts as a duplicate when its signatures agree on at least
+# `threshold` of the positions (the estimated shingle Jaccard similarity).
+#
+# Clusters are stars: the first document seen becomes the representative and
+# later documents join the best-matching representative, so a chain of small
+# edits never drifts into one huge cluster. A Deduplicator remembers its
+# representatives and their predict_proba rows, so one instance passed across
+# the chunks of a run also catches duplicates of documents scored earlier.
+DEDUP_THRESHOLD = 0.8
+_MINHASH_PRIME = 4294967291   # largest prime below 2**32
+
+class Deduplicator:
+    def __init__(self, threshold=DEDUP_THRESHOLD, num_perm=64, bands=16, shingle_size=3, seed=1):
+        import numpy as np
+
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.bands, self.rows = bands, num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MINHASH_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MINHASH_PRIME, num_perm, dtype=np.uint64)
+        self._buckets = [{} for _ in range(bands)]
+        self.ids = []          # representative number -> document id
+        self._signatures = []  # representative number -> (num_perm,) uint32
+        self._proba = {}       # representative number -> predict_proba row
+
+    def _shingle_hashes(self, tokens):
+        import zlib
+        import numpy as np
+
+        k = min(self.shingle_size, len(tokens)) or 1
+        shingles = {" ".join(tokens[i:i + k]) for i in range(max(len(tokens) - k + 1, 1))}
+        return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                           dtype=np.uint64, count=len(shingles))
+
+    def signature(self, doc):
+        import numpy as np
+
+        hashes = self._shingle_hashes(analyze_tokens(doc))
+        # a, b and the hashes are below 2**32, so a * h + b fits in 64 bits;
+        # a prime this close to the product range keeps the permutations
+        # independent (a Mersenne 2**61 - 1 barely wraps and favours small h).
+        values = (hashes[:, None] * self._a + self._b) % np.uint64(_MINHASH_PRIME)
+        return values.min(axis=0).astype(np.uint32)
+
+    # One (representative number, is_new) pair per document, in order.
+    def assign(self, ids, docs):
+        import numpy as np
+
+        assigned = []
+        for doc_id, doc in zip(ids, docs):
+            signature = self.signature(doc)
+            keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+            candidates = set()
+            for bucket, key in zip(self._buckets, keys):
+                candidates.update(bucket.get(key, ()))
+            best, best_score = None, self.threshold
+            for rep in candidates:
+                score = float(np.mean(self._signatures[rep] == signature))
+                if score >= best_score:
+                    best, best_score = rep, score
+            if best is not None:
+                assigned.append((best, False))
+                continue
+            rep = len(self.ids)
+            self.ids.append(str(doc_id))
+            self._signatures.append(signature)
+            for bucket, key in zip(self._buckets, keys):
+                bucket.setdefault(key, []).append(rep)
+            assigned.append((rep, True))
+        return assigned
+
+    def remember(self, rep, proba):
+        self._proba[rep] = proba
+
+    def proba(self, rep):
+        return self._proba[rep]
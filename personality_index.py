@@ -0,0 +1,219 @@
+# ---------- IMPORTS ----------
+# numpy, scipy and sklearn are imported inside the methods that need them, as
+# in personality_predictor.
+import hashlib
+import json
+import os
+
+from personality_predictor import get_model
+
+# ---------- SIMILARITY INDEX ----------
+# "Find CVs that read like this one": cosine similarity over the pipeline's own
+# feature vectors (every step before the classifier), L2-normalised so cosine
+# similarity is a plain dot product.
+#
+# Vectors are stored term-major (the transposed matrix, as CSR), which makes
+# each segment an inverted index: a query only touches the postings of its own
+# terms. Documents live in segments of up to segment_rows; a block of queries
+# is one sparse product per segment followed by an argpartition top-k, and the
+# per-segment candidates are merged at the end.
+#
+# On disk a segment is three .npy arrays, memory-mapped on open, plus a JSON
+# list of document ids. manifest.json lists the segments and a fingerprint of
+# the vectorizer, since vectors from a retrained model are not comparable.
+# add() buffers documents in memory; save() tops up the last segment and
+# starts new ones as needed, under fresh file names and then swaps the manifest, so readers
+# never see a half-written index. Re-adding an id replaces its older vector.
+INDEX_DIR = os.environ.get(
+    "PERSONALITY_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "personality_index"),
+)
+INDEX_FORMAT_VERSION = 1
+INDEX_SEGMENT_ROWS = 1 << 17
+
+def vectorizer_fingerprint(model):
+    import numpy as np
+
+    digest = hashlib.sha256()
+    for _name, step in model.steps[:-1]:
+        digest.update(type(step).__name__.encode("ascii") + b"\0")
+        vocabulary = getattr(step, "vocabulary_", None)
+        if vocabulary is not None:
+            for term in sorted(vocabulary, key=vocabulary.get):
+                digest.update(term.encode("utf-8") + b"\0")
+        if getattr(step, "n_features", None) is not None:
+            digest.update(str(step.n_features).encode("ascii") + b"\0")
+        if hasattr(step, "idf_"):
+            digest.update(np.ascontiguousarray(step.idf_, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+class SimilarityIndex:
+    def __init__(self, directory=INDEX_DIR, model=None, segment_rows=INDEX_SEGMENT_ROWS):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.model = model if model is not None else get_model()
+        self.fingerprint = vectorizer_fingerprint(self.model)
+        self._load()
+
+    def __len__(self):
+        return len(self._live)
+
+    def _load(self):
+        import numpy as np
+        from scipy.sparse import csr_matrix
+
+        self._manifest = {"format_version": INDEX_FORMAT_VERSION, "fingerprint": self.fingerprint,
+                          "generation": 0, "n_features": None, "segments": []}
+        try:
+            with open(os.path.join(self.directory, "manifest.json"), encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except FileNotFoundError:
+            manifest = None
+        if manifest is not None:
+            if manifest.get("format_version") != INDEX_FORMAT_VERSION:
+                raise ValueError(f"{self.directory}: index format {manifest.get('format_version')} "
+                                 f"!= {INDEX_FORMAT_VERSION}")
+            if manifest.get("fingerprint") != self.fingerprint:
+                raise ValueError(f"{self.directory}: built with a different vectorizer; rebuild the index")
+            self._manifest = manifest
+
+        self._segments, self._dead, self._live = [], [], {}
+        for seg_no, segment in enumerate(self._manifest["segments"]):
+            base = os.path.join(self.directory, segment["name"])
+            arrays = tuple(np.load(f"{base}.{part}.npy", mmap_mode="r") for part in ("data", "indices", "indptr"))
+            Xt = csr_matrix(arrays, shape=(self._manifest["n_features"], segment["rows"]), copy=False)
+            with open(base + ".ids.json", encoding="utf-8") as fh:
+                ids = json.load(fh)
+            self._segments.append((np.array(ids, dtype=object), Xt))
+            self._dead.append(np.zeros(len(ids), dtype=bool))
+            for row, doc_id in enumerate(ids):
+                self._mark(doc_id, seg_no, row)
+        self._pending_ids, self._pending, self._pending_dead = [], [], set()
+        self._pending_Xt = None
+
+    # seg_no -1 is the in-memory buffer of unsaved documents.
+    def _mark(self, doc_id, seg_no, row):
+        old = self._live.get(doc_id)
+        if old is not None:
+            if old[0] < 0:
+                self._pending_dead.add(old[1])
+            else:
+                self._dead[old[0]][old[1]] = True
+        self._live[doc_id] = (seg_no, row)
+
+    def _prepare(self, X):
+        import numpy as np
+        from sklearn.preprocessing import normalize
+
+        return normalize(X.tocsr().astype(np.float32), copy=False)
+
+    def transform(self, docs):
+        return self.model[:-1].transform(docs)
+
+    def add(self, ids, docs):
+        self.add_vectors(ids, self.transform(docs))
+
+    # X is the output of the pipeline's vectorizer steps (see transform), one
+    # row per id; predict_batch passes the matrix it already built.
+    def add_vectors(self, ids, X):
+        ids = [str(doc_id) for doc_id in ids]
+        if len(ids) != X.shape[0]:
+            raise ValueError(f"{len(ids)} ids for {X.shape[0]} vectors")
+        for doc_id in ids:
+            self._mark(doc_id, -1, len(self._pending_ids))
+            self._pending_ids.append(doc_id)
+        self._pending.append(self._prepare(X))
+        self._pending_Xt = None
+        if len(self._pending_ids) >= self.segment_rows:
+            self.save()
+
+    def _searchable(self):
+        import numpy as np
+        from scipy.sparse import vstack
+
+        parts = [(ids, Xt, dead if dead.any() else None)
+                 for (ids, Xt), dead in zip(self._segments, self._dead)]
+        if self._pending_ids:
+            if self._pending_Xt is None:
+                self._pending_Xt = vstack(self._pending).T.tocsr()
+            dead = None
+            if self._pending_dead:
+                dead = np.zeros(len(self._pending_ids), dtype=bool)
+                dead[list(self._pending_dead)] = True
+            parts.append((np.array(self._pending_ids, dtype=object), self._pending_Xt, dead))
+        return parts
+
+    def query(self, docs, k=10):
+        return self.query_vectors(self.transform(docs), k)
+
+    # One list of {"id", "score"} per query row, best first; documents sharing
+    # no terms with the query (score 0) are left out.
+    def query_vectors(self, X, k=10, block_size=32):
+        import numpy as np
+
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        Q = self._prepare(X)
+        parts = self._searchable()
+        results = []
+        for start in range(0, Q.shape[0], block_size):
+            Qb = Q[start:start + block_size]
+            if not parts:
+                results.extend([] for _ in range(Qb.shape[0]))
+                continue
+            scores, ids = [], []
+            for seg_ids, Xt, dead in parts:
+                S = (Qb @ Xt).toarray()
+                if dead is not None:
+                    S[:, dead] = -np.inf
+                kk = min(k, S.shape[1])
+                top = np.argpartition(S, S.shape[1] - kk, axis=1)[:, -kk:]
+                scores.append(np.take_along_axis(S, top, axis=1))
+                ids.append(seg_ids[top])
+            scores, ids = np.hstack(scores), np.hstack(ids)
+            order = np.argsort(-scores, axis=1)[:, :k]
+            for row, cols in enumerate(order):
+                results.append([{"id": ids[row, c], "score": round(float(scores[row, c]), 4)}
+                                for c in cols if scores[row, c] > 0])
+        return results
+
+    def save(self):
+        import numpy as np
+        from scipy.sparse import hstack
+
+        if not self._pending_ids:
+            return
+        self._searchable()
+        Xt, ids = self._pending_Xt, self._pending_ids
+        segments = list(self._manifest["segments"])
+        if segments and segments[-1]["rows"] < self.segment_rows:
+            segments.pop()
+            last_ids, last_Xt = self._segments[-1]
+            Xt, ids = hstack([last_Xt, Xt], format="csr"), list(last_ids) + ids
+        generation = self._manifest["generation"] + 1
+
+        os.makedirs(self.directory, exist_ok=True)
+        for start in range(0, len(ids), self.segment_rows):
+            name = f"seg-{len(segments):05d}-g{generation}"
+            part = Xt[:, start:start + self.segment_rows].tocsr()
+            base = os.path.join(self.directory, name)
+            for key in ("data", "indices", "indptr"):
+                np.save(f"{base}.{key}.npy", getattr(part, key))
+            with open(base + ".ids.json", "w", encoding="utf-8") as fh:
+                json.dump(ids[start:start + self.segment_rows], fh, ensure_ascii=False)
+            segments.append({"name": name, "rows": part.shape[1]})
+
+        manifest = {**self._manifest, "generation": generation, "n_features": Xt.shape[0], "segments": segments}
+        tmp_path = os.path.join(self.directory, "manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, "manifest.json"))
+
+        live = {segment["name"] for segment in segments}
+        for name in os.listdir(self.directory):
+            if name.startswith("seg-") and name.split(".", 1)[0] not in live:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        self._load()
@@ -1,63 +1,1402 @@
-# ---------- IMPORTS ----------
-import nltk
-nltk.data.path.insert(0, r"C:\Users\ASUS\AppData\Roaming\nltk_data")
-
-import re
-from PyPDF2 import PdfReader
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.pipeline import make_pipeline
-import random
-
-# ---------- FUNCTION: Extract Text ----------
-def extract_text_from_pdf(pdf_path):
-    reader = PdfReader(pdf_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
-
-# ---------- FUNCTION: Preprocess Text ----------
-def preprocess_text(text):
-    tokens = re.findall(r'\b\w+\b', text.lower())
-    return " ".join(tokens)
-
-# ---------- SAMPLE TRAINING DATA ----------
-train_texts = [
-    "team player leadership project manager communication public speaker",
-    "creative open-minded research writing art music design thinking",
-    "organized detail-oriented responsible deadline planning time management",
-    "emotional anxious mood stress overthinking worry nervous",
-    "friendly helpful cooperative social volunteer group harmony"
-]
-train_labels = [
-    "Extroversion", "Openness", "Conscientiousness", "Neuroticism", "Agreeableness"
-]
-
-# ---------- TRAIN MODEL ----------
-model = make_pipeline(TfidfVectorizer(), MultinomialNB())
-model.fit(train_texts, train_labels)
-
-# ---------- LOAD AND PREDICT ----------
-cv_text = extract_text_from_pdf("cv_sample.pdf")
-cleaned_text = preprocess_text(cv_text)
-prediction = model.predict([cleaned_text])[0]
-
-# ---------- RANDOM VISUAL TRAITS ----------
-def random_trait_scores():
-    return {
-        "Extroversion": random.randint(20, 90),
-        "Openness": random.randint(20, 90),
-        "Conscientiousness": random.randint(20, 90),
-        "Agreeableness": random.randint(20, 90),
-        "Neuroticism": random.randint(20, 90)
-    }
-
-# ---------- OUTPUT ----------
-print("🧠 Predicted Dominant Personality Trait:", prediction)
-print("📊 Trait Scores (for display):")
-trait_scores = random_trait_scores()
-trait_scores[prediction] = 90  # Boost predicted trait
-
-for trait, score in trait_scores.items():
-    print(f"- {trait}: {score}%")
+# ---------- IMPORTS ----------
+# Only light standard-library modules are imported here. PyPDF2, joblib, sklearn
+# and the process pool are imported inside the functions that need them, so
+# `import personality_predictor` stays cheap and has no side effects.
+import bisect
+import copy
+import csv
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+import random
+
+# ---------- METRICS ----------
+# Opt-in instrumentation of the hot path. It records per-stage latency
+# histograms (extract, preprocess, vectorize, classify), the documents each
+# stage handled, pages and tokens per document, and text cache lookups. Set
+# PERSONALITY_METRICS=1 (or METRICS.enabled = True) to turn it on; when off,
+# every hook is an attribute check and an early return. render() produces the
+# Prometheus text format, which personality_server.py serves at /metrics and
+# dump() writes to a file (e.g. for node_exporter's textfile collector).
+#
+# Metrics are per process: pool workers measure their documents into a stats
+# dict (see pdf_tokens) that the parent records with observe_doc().
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+METRIC_HELP = {
+    "personality_stage_seconds": "Wall time of one call to a pipeline stage.",
+    "personality_stage_docs_total": "Documents processed by a pipeline stage.",
+    "personality_stage_errors_total": "Pipeline stage calls that raised.",
+    "personality_pages_per_doc": "PDF pages per extracted document.",
+    "personality_tokens_per_doc": "Tokens per document after preprocessing.",
+    "personality_text_cache_total": "Text cache lookups by result.",
+    "personality_duplicates_total": "Documents that reused a near-duplicate's result instead of being scored.",
+}
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class _Stage:
+    __slots__ = ("metrics", "name", "docs", "started")
+
+    def __init__(self, metrics, name, docs):
+        self.metrics, self.name, self.docs = metrics, name, docs
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record_stage(self.name, time.perf_counter() - self.started, self.docs, exc_type is not None)
+        return False
+
+class _NoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NO_STAGE = _NoStage()
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels) + "}"
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.help = dict(METRIC_HELP)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    # `with METRICS.stage("vectorize", len(docs)): ...` times one call.
+    def stage(self, name, docs=1):
+        if not self.enabled:
+            return _NO_STAGE
+        return _Stage(self, name, docs)
+
+    def record_stage(self, name, seconds, docs=1, failed=False):
+        if not self.enabled:
+            return
+        self.observe("personality_stage_seconds", seconds, stage=name)
+        self.inc("personality_stage_docs_total", docs, stage=name)
+        if failed:
+            self.inc("personality_stage_errors_total", stage=name)
+
+    def observe_doc(self, stats):
+        if not self.enabled or not stats:
+            return
+        if stats.get("cache"):
+            self.inc("personality_text_cache_total", result=stats["cache"])
+        if "extract_s" in stats:
+            self.record_stage("extract", stats["extract_s"])
+            self.observe("personality_pages_per_doc", stats["pages"], PAGE_BUCKETS)
+        self.record_stage("preprocess", stats["preprocess_s"])
+        self.observe("personality_tokens_per_doc", stats["tokens"], TOKEN_BUCKETS)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (hist.buckets, list(hist.counts), hist.sum, hist.count))
+                                for key, hist in self._histograms.items())
+        lines, described = [], set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            describe(name, "histogram")
+            cumulative = 0
+            for bound, n in zip((*buckets, "+Inf"), counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_label_text((*labels, ('le', bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(self.render())
+        os.replace(tmp_path, path)
+
+METRICS = Metrics(enabled=bool(os.environ.get("PERSONALITY_METRICS") or os.environ.get("PERSONALITY_METRICS_FILE")))
+
+# ---------- PDF SOURCES ----------
+# The extractor takes a path, bytes, bytearray, memoryview, mmap or an open
+# binary file. Given a path, PyPDF2 would read the whole file into a BytesIO;
+# instead the file is memory-mapped and PyPDF2 reads it through BufferStream,
+# which only copies the byte ranges actually parsed. In-memory buffers are
+# wrapped the same way, so uploads never need a temp file or an extra copy.
+PDF_BUFFER_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+class BufferStream(io.RawIOBase):
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence {whence}")
+        if pos < 0:
+            raise OSError("negative seek position")
+        self._pos = pos
+        return pos
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        data = self._view[self._pos:end].tobytes() if end > self._pos else b""
+        self._pos = max(self._pos, end)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+class open_pdf_source:
+    def __init__(self, source):
+        self.source = source
+        self._file = self._map = None
+
+    def __enter__(self):
+        if isinstance(self.source, (str, os.PathLike)):
+            self._file = open(self.source, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._stream = BufferStream(self._map)
+            return self._stream
+        if isinstance(self.source, PDF_BUFFER_TYPES):
+            self._stream = BufferStream(self.source)
+            return self._stream
+        return self.source
+
+    def __exit__(self, *exc):
+        if isinstance(self.source, (str, os.PathLike, *PDF_BUFFER_TYPES)):
+            self._stream.close()
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        return False
+
+def pdf_source_sha256(source):
+    if isinstance(source, PDF_BUFFER_TYPES):
+        return hashlib.sha256(memoryview(source)).hexdigest()
+    return _file_sha256(source)
+
+# ---------- FUNCTION: Extract Text ----------
+# Pages are parsed lazily, one at a time; pages without a text layer (scans)
+# come back from PyPDF2 as None and are yielded as "".
+#
+# With workers > 1 (None = one per CPU), documents of at least
+# PARALLEL_MIN_PAGES pages are split into contiguous page ranges that worker
+# processes parse independently, each mapping the file itself. Ranges are
+# yielded back in page order as soon as each one and those before it finish.
+# Shorter documents and in-memory streams are parsed serially, since a worker
+# would spend longer reopening the file than extracting it.
+PARALLEL_MIN_PAGES = 64
+
+def _extract_page_range(pdf_path, start, stop):
+    from PyPDF2 import PdfReader
+
+    with open_pdf_source(pdf_path) as stream:
+        reader = PdfReader(stream)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def _iter_page_ranges(pdf_path, n_pages, workers):
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Two ranges per worker, so one slow range does not leave cores idle.
+    step = -(-n_pages // (workers * 2))
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(_extract_page_range, pdf_path, start, min(start + step, n_pages))
+                   for start in range(0, n_pages, step)]
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Also runs when the consumer stops early (e.g. a token budget).
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def iter_pdf_pages(pdf_path, workers=1):
+    from PyPDF2 import PdfReader
+
+    workers = workers or os.cpu_count() or 1
+    with open_pdf_source(pdf_path) as stream:
+        reader = PdfReader(stream)
+        n_pages = len(reader.pages)
+        if not (workers > 1 and isinstance(pdf_path, (str, os.PathLike)) and n_pages >= PARALLEL_MIN_PAGES):
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+    yield from _iter_page_ranges(pdf_path, n_pages, workers)
+
+# With max_tokens set, parsing stops after the page that reaches the budget.
+def extract_text_from_pdf(pdf_path, max_tokens=None, workers=1):
+    parts = []
+    seen = 0
+    for page_text in iter_pdf_pages(pdf_path, workers):
+        parts.append(page_text)
+        if max_tokens is not None:
+            seen += len(TOKEN_RE.findall(page_text))
+            if seen >= max_tokens:
+                break
+    return "\n".join(parts)
+
+# ---------- FUNCTION: Tokenize ----------
+# One precompiled pattern is shared by preprocessing and the TF-IDF vectorizer,
+# so a document is tokenized exactly once: the pipeline's analyzer passes token
+# lists straight through and only tokenizes plain strings.
+TOKEN_RE = re.compile(r"\b\w+\b")
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+# Streams tokens from an iterable of text chunks (e.g. iter_pdf_pages), so
+# only one page is ever lowercased and held in memory at a time.
+def iter_tokens(chunks, max_tokens=None):
+    seen = 0
+    for chunk in chunks:
+        for token in TOKEN_RE.findall(chunk.lower()):
+            yield token
+            seen += 1
+            if max_tokens is not None and seen >= max_tokens:
+                return
+
+def analyze_tokens(doc):
+    return tokenize(doc) if isinstance(doc, str) else doc
+
+# ---------- FUNCTION: Preprocess Text ----------
+def preprocess_text(text):
+    return " ".join(tokenize(text))
+
+# ---------- TEXT CACHE ----------
+# Cleaned text keyed by the SHA-256 of the PDF bytes, one small file per entry.
+# File mtimes act as the LRU clock: a hit touches its entry, and a put that
+# takes the cache past max_bytes deletes the least recently used entries.
+# The running size is seeded by one directory walk per process. Pool workers
+# get a non-accounting view (for_workers) and report the bytes they wrote; the
+# parent adds them with account() after each chunk, so only the parent ever
+# walks the directory or evicts.
+CACHE_DIR = os.environ.get(
+    "PERSONALITY_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "personality_predictor", "text"),
+)
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+class TextCache:
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, accounting=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.accounting = accounting
+        self._size = None
+
+    def for_workers(self):
+        return TextCache(self.directory, self.max_bytes, accounting=False)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest + ".txt")
+
+    def _entries(self):
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".txt"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def get(self, digest):
+        path = self._path(digest)
+        try:
+            with open(path, encoding="utf-8") as fh:
+                text = fh.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return text
+
+    def put(self, digest, text):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        if self.accounting:
+            self.account(size)
+        return size
+
+    def account(self, nbytes):
+        if self._size is None:
+            # The walk already sees the bytes just written.
+            self._size = sum(size for _mtime, size, _path in self._entries())
+        else:
+            self._size += nbytes
+        if self._size > self.max_bytes:
+            self.evict()
+
+    # Trims to 90% of max_bytes so a full cache does not evict on every put.
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _mtime, size, _path in entries)
+        target = int(self.max_bytes * 0.9)
+        for _mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+# Hashing the bytes is far cheaper than parsing them, so on a hit PyPDF2 is
+# never imported or run. The cache stores the token stream space-joined.
+# pdf_path may be any source open_pdf_source accepts except an open file.
+#
+# With metrics enabled the document is recorded into METRICS; a caller that
+# passes its own `stats` dict (a pool worker) gets the measurements there
+# instead. Extraction and tokenizing are interleaved page by page, so time
+# spent inside the page iterator counts as extract and the rest as preprocess.
+def _timed_pages(pages, stats):
+    stats["extract_s"], stats["pages"] = 0.0, 0
+    pages = iter(pages)
+    while True:
+        started = time.perf_counter()
+        page = next(pages, None)
+        stats["extract_s"] += time.perf_counter() - started
+        if page is None:
+            return
+        stats["pages"] += 1
+        yield page
+
+def pdf_tokens(pdf_path, cache=None, max_tokens=None, page_workers=1, stats=None):
+    record = stats is None and METRICS.enabled
+    if record:
+        stats = {}
+    started = time.perf_counter()
+    digest = None
+    if cache is not None and max_tokens is None:
+        digest = pdf_source_sha256(pdf_path)
+        text = cache.get(digest)
+        if text is not None:
+            tokens = text.split()
+            if stats is not None:
+                stats.update(cache="hit", tokens=len(tokens), preprocess_s=time.perf_counter() - started)
+                if record:
+                    METRICS.observe_doc(stats)
+            return tokens
+    pages = iter_pdf_pages(pdf_path, page_workers)
+    if stats is not None:
+        pages = _timed_pages(pages, stats)
+    tokens = list(iter_tokens(pages, max_tokens))
+    if stats is not None:
+        stats.update(cache="miss" if digest else None, tokens=len(tokens),
+                     preprocess_s=time.perf_counter() - started - stats["extract_s"])
+        if record:
+            METRICS.observe_doc(stats)
+    if digest is not None:
+        written = cache.put(digest, " ".join(tokens))
+        if stats is not None:
+            stats["cache_bytes"] = written
+    return tokens
+
+# ---------- SAMPLE TRAINING DATA ----------
+train_texts = [
+    "team player leadership project manager communication public speaker",
+    "creative open-minded research writing art music design thinking",
+    "organized detail-oriented responsible deadline planning time management",
+    "emotional anxious mood stress overthinking worry nervous",
+    "friendly helpful cooperative social volunteer group harmony"
+]
+train_labels = [
+    "Extroversion", "Openness", "Conscientiousness", "Neuroticism", "Agreeableness"
+]
+TRAITS = ("Extroversion", "Openness", "Conscientiousness", "Agreeableness", "Neuroticism")
+
+# ---------- FEATURES: Streaming IDF ----------
+# IDF weighting for hashed term counts. Document frequencies live in one fixed
+# int32 array of n_features slots, so memory does not grow with the corpus, and
+# partial_fit folds in one chunk of documents at a time. The weighting matches
+# TfidfTransformer's defaults (smooth idf, l2 norm).
+#
+# It is a real sklearn transformer (TransformerMixin, BaseEstimator), so sliced
+# pipelines like model[:-1] and sklearn's tag lookups work. Importing sklearn
+# is what the lazy imports above avoid, so the class is built on first use by
+# _streaming_idf_class() and published as `StreamingIdfTransformer` through the
+# module-level __getattr__ (which is also how pickle finds it in saved models).
+_STREAMING_IDF = None
+
+def _streaming_idf_class():
+    global _STREAMING_IDF
+    if _STREAMING_IDF is not None:
+        return _STREAMING_IDF
+
+    import numpy as np
+    from sklearn.base import BaseEstimator, TransformerMixin
+    from sklearn.preprocessing import normalize
+
+    class StreamingIdfTransformer(TransformerMixin, BaseEstimator):
+        def __init__(self, n_features=2 ** 18, norm="l2"):
+            self.n_features = n_features
+            self.norm = norm
+
+        def fit(self, X, y=None):
+            for name in ("df_", "n_docs_", "_idf"):
+                self.__dict__.pop(name, None)
+            return self.partial_fit(X)
+
+        def partial_fit(self, X, y=None):
+            if not hasattr(self, "df_"):
+                self.df_ = np.zeros(self.n_features, dtype=np.int32)
+                self.n_docs_ = 0
+            X = X.tocsr()
+            X.sum_duplicates()
+            self.df_ += np.bincount(X.indices, minlength=self.n_features).astype(np.int32)
+            self.n_docs_ += X.shape[0]
+            self._idf = None
+            return self
+
+        def __sklearn_is_fitted__(self):
+            return hasattr(self, "df_")
+
+        @property
+        def idf_(self):
+            if getattr(self, "_idf", None) is None:
+                self._idf = np.log((1.0 + self.n_docs_) / (1.0 + self.df_)) + 1.0
+            return self._idf
+
+        def transform(self, X):
+            X = X.tocsr().astype("float64", copy=True)
+            X.data *= self.idf_[X.indices]
+            return normalize(X, norm=self.norm, copy=False) if self.norm else X
+
+    StreamingIdfTransformer.__module__ = __name__
+    StreamingIdfTransformer.__qualname__ = "StreamingIdfTransformer"
+    _STREAMING_IDF = StreamingIdfTransformer
+    return _STREAMING_IDF
+
+# ---------- TRAIN MODEL ----------
+# features="tfidf" keeps an exact vocabulary (the original model);
+# features="hashed" uses the hashing trick, with a fixed memory footprint no
+# matter how many distinct terms the corpus has.
+FEATURE_MODES = ("tfidf", "hashed")
+HASHED_N_FEATURES = 2 ** 18
+
+def build_pipeline(features="tfidf", n_features=HASHED_N_FEATURES):
+    from sklearn.naive_bayes import MultinomialNB
+    from sklearn.pipeline import make_pipeline
+
+    if features == "tfidf":
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        return make_pipeline(TfidfVectorizer(analyzer=analyze_tokens), MultinomialNB())
+    if features == "hashed":
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        return make_pipeline(
+            HashingVectorizer(analyzer=analyze_tokens, n_features=n_features, alternate_sign=False, norm=None),
+            _streaming_idf_class()(n_features=n_features),
+            MultinomialNB(),
+        )
+    raise ValueError(f"features must be one of {FEATURE_MODES}, got {features!r}")
+
+def train_model(texts=train_texts, labels=train_labels, features="tfidf"):
+    model = build_pipeline(features)
+    model.fit(texts, labels)
+    return model
+
+# ---------- LABELED CORPUS ----------
+# One JSON object per line with "text" and "label" keys.
+def iter_labeled_corpus(path):
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                record = json.loads(line)
+                yield record["text"], record["label"]
+
+# ---------- FEATURE MODE COMPARISON ----------
+# Each mode is fitted in a fresh process, so its peak RSS is not polluted by
+# the other mode. Documents are split 80/20 with a fixed shuffle.
+
+# VmHWM is per address space; ru_maxrss survives exec on Linux, so a spawned
+# child would otherwise report its parent's high-water mark.
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_kb / (1024 * 1024) if sys.platform == "darwin" else peak_kb / 1024
+
+def _evaluate_feature_mode(features, corpus_path, test_fraction, n_features):
+    import pickle
+
+    docs = [(tokenize(text), label) for text, label in iter_labeled_corpus(corpus_path)]
+    random.Random(0).shuffle(docs)
+    n_test = max(1, int(len(docs) * test_fraction))
+    test, train = docs[:n_test], docs[n_test:]
+
+    model = build_pipeline(features, n_features)
+    # Corpus and tokens are already resident; fit_rss_mb is what fitting adds on top.
+    baseline_mb = peak_rss_mb()
+    started = time.perf_counter()
+    model.fit([tokens for tokens, _label in train], [label for _tokens, label in train])
+    fit_seconds = time.perf_counter() - started
+    fitted_mb = peak_rss_mb()
+    predicted = model.predict([tokens for tokens, _label in test])
+    accuracy = sum(p == label for p, (_tokens, label) in zip(predicted, test)) / len(test)
+    return {
+        "features": features,
+        "train_docs": len(train),
+        "test_docs": len(test),
+        "accuracy": round(accuracy, 4),
+        "fit_seconds": round(fit_seconds, 3),
+        "peak_rss_mb": None if fitted_mb is None else round(fitted_mb, 1),
+        "fit_rss_mb": None if fitted_mb is None else round(fitted_mb - baseline_mb, 1),
+        "model_mb": round(len(pickle.dumps(model)) / (1024 * 1024), 2),
+    }
+
+def compare_feature_modes(corpus_path, test_fraction=0.2, n_features=HASHED_N_FEATURES):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    reports = []
+    for features in FEATURE_MODES:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            reports.append(pool.submit(_evaluate_feature_mode, features, corpus_path, test_fraction, n_features).result())
+    return reports
+
+# ---------- MODEL ARTIFACT ----------
+# The fitted pipeline is saved once with joblib next to a JSON manifest that
+# records the artifact format, a SHA-256 of the file, the sklearn version and
+# a fingerprint of the training data. Arrays are memory-mapped on load, so
+# every worker process maps the same pages instead of holding its own copy.
+MODEL_PATH = os.environ.get(
+    "PERSONALITY_MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "personality_model.joblib"),
+)
+ARTIFACT_FORMAT_VERSION = 2
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def training_fingerprint(texts=train_texts, labels=train_labels):
+    digest = hashlib.sha256()
+    for text, label in zip(texts, labels):
+        digest.update(label.encode("utf-8") + b"\0" + text.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+def save_model(model, path=MODEL_PATH, fingerprint=None, features="tfidf", source="sample"):
+    import joblib
+    import sklearn
+
+    tmp_path = path + ".tmp"
+    joblib.dump(model, tmp_path)
+    manifest = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "sha256": _file_sha256(tmp_path),
+        "sklearn_version": sklearn.__version__,
+        "classes": [str(c) for c in model.classes_],
+        "training_fingerprint": fingerprint,
+        "features": features,
+        "training_source": source,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    # Both files are complete on disk before either is swapped in, so the pair
+    # is only out of step if the process dies between the two renames.
+    with open(path + ".json.tmp", "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp_path, path)
+    os.replace(path + ".json.tmp", path + ".json")
+    return manifest
+
+def load_manifest(path=MODEL_PATH):
+    with open(path + ".json", encoding="utf-8") as fh:
+        return json.load(fh)
+
+def load_model(path=MODEL_PATH, verify=True, mmap_mode="r"):
+    import joblib
+    import sklearn
+
+    manifest = load_manifest(path)
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"{path}: artifact format {manifest.get('format_version')} != {ARTIFACT_FORMAT_VERSION}")
+    if manifest.get("sklearn_version") != sklearn.__version__:
+        raise ValueError(f"{path}: built with sklearn {manifest.get('sklearn_version')}, running {sklearn.__version__}")
+    if verify and _file_sha256(path) != manifest["sha256"]:
+        raise ValueError(f"{path}: SHA-256 does not match its manifest")
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+# Reuses the saved artifact when it was trained on a corpus or matches the
+# current sample data, and retrains (and re-saves, if the location is
+# writable) when it is missing or is a stale sample model. A corpus-trained
+# artifact that fails to load is an error: it is never replaced by the sample
+# model.
+def load_or_train_model(path=MODEL_PATH):
+    fingerprint = training_fingerprint()
+    try:
+        manifest = load_manifest(path)
+    except FileNotFoundError:
+        manifest = None
+    if manifest is not None:
+        source = manifest.get("training_source", "sample")
+        if source != "sample":
+            try:
+                return load_model(path)
+            except (OSError, ValueError) as e:
+                raise ValueError(f"{path} was trained on {source} and cannot be loaded ({e}); "
+                                 "retrain it with `train` instead of falling back to the sample model") from e
+        if manifest.get("training_fingerprint") == fingerprint:
+            try:
+                return load_model(path)
+            except (OSError, ValueError):
+                pass
+    model = train_model()
+    try:
+        save_model(model, path, fingerprint=fingerprint)
+    except OSError:
+        pass
+    return model
+
+# ---------- INCREMENTAL TRAINING ----------
+# Trains the hashed pipeline on a labeled JSONL corpus larger than RAM: the
+# corpus is read in chunks of chunk_size documents, each chunk updates the
+# streaming IDF and then MultinomialNB.partial_fit, and only one chunk is in
+# memory at a time. Every checkpoint_every chunks (and on Ctrl-C) the model and
+# the byte offset reached are written to checkpoint_path, and a rerun with the
+# same arguments seeks straight past the documents already learned.
+def _iter_corpus_from(path, offset):
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        for line in fh:
+            offset += len(line)
+            if line.strip():
+                record = json.loads(line)
+                yield record["text"], record["label"], offset
+
+def _save_checkpoint(checkpoint_path, state):
+    import joblib
+
+    tmp_path = checkpoint_path + ".tmp"
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, checkpoint_path)
+
+# Learns on a copy and returns it: a Ctrl-C halfway through partial_fit must
+# not leave a model that has absorbed part of a chunk the offset says is unread.
+def _learn_chunk(model, chunk):
+    model = copy.deepcopy(model)
+    hasher, idf, nb = (step for _name, step in model.steps)
+    X = hasher.transform([tokens for tokens, _label in chunk])
+    idf.partial_fit(X)
+    nb.partial_fit(idf.transform(X), [label for _tokens, label in chunk], classes=list(TRAITS))
+    return model
+
+def _advance(state, chunk, offset):
+    return {**state, "model": _learn_chunk(state["model"], chunk),
+            "offset": offset, "docs_done": state["docs_done"] + len(chunk)}
+
+def train_incremental(corpus_path, chunk_size=10000, checkpoint_path=None, checkpoint_every=10,
+                      n_features=HASHED_N_FEATURES, model_path=MODEL_PATH, log=print):
+    import joblib
+
+    checkpoint_path = checkpoint_path or model_path + ".ckpt"
+    corpus_path = os.path.abspath(corpus_path)
+    if os.path.exists(checkpoint_path):
+        state = joblib.load(checkpoint_path)
+        if state["corpus_path"] != corpus_path or state["n_features"] != n_features:
+            raise ValueError(f"{checkpoint_path} belongs to {state['corpus_path']} "
+                             f"(n_features={state['n_features']}); remove it to start over")
+        log(f"↻ Resuming at document {state['docs_done']:,} (byte {state['offset']:,})")
+    else:
+        state = {"corpus_path": corpus_path, "n_features": n_features, "offset": 0, "docs_done": 0,
+                 "model": build_pipeline("hashed", n_features)}
+
+    chunk, chunks_done = [], 0
+    try:
+        for text, label, offset in _iter_corpus_from(corpus_path, state["offset"]):
+            chunk.append((tokenize(text), label))
+            if len(chunk) < chunk_size:
+                continue
+            state = _advance(state, chunk, offset)
+            chunk, chunks_done = [], chunks_done + 1
+            if chunks_done % checkpoint_every == 0:
+                _save_checkpoint(checkpoint_path, state)
+                log(f"💾 Checkpoint at document {state['docs_done']:,}")
+        if chunk:
+            state = _advance(state, chunk, offset)
+    except KeyboardInterrupt:
+        # state is only ever replaced whole (model, offset and count together,
+        # see _advance), so it always ends on a chunk boundary and the
+        # interrupted chunk is simply re-read on resume.
+        _save_checkpoint(checkpoint_path, state)
+        log(f"💾 Interrupted; checkpoint at document {state['docs_done']:,}")
+        raise
+
+    save_model(state["model"], model_path, fingerprint=_file_sha256(corpus_path),
+               features="hashed", source=corpus_path)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    log(f"✅ Trained on {state['docs_done']:,} documents → {model_path}")
+    return state["model"]
+
+# ---------- LAZY MODEL ----------
+# The model is loaded on first use rather than at import. `personality_predictor.model`
+# still works for existing callers through the module-level __getattr__ below,
+# which also publishes the lazily built StreamingIdfTransformer class and the
+# names that moved to personality_index, personality_dedup and personality_results.
+_MODEL = None
+_MOVED = {
+    "personality_index": ("INDEX_DIR", "SimilarityIndex", "vectorizer_fingerprint"),
+    "personality_dedup": ("DEDUP_THRESHOLD", "Deduplicator"),
+    "personality_results": ("NO_LABEL", "RESULT_FORMATS", "ResultStore", "load_results"),
+}
+
+def get_model():
+    global _MODEL
+    if _MODEL is None:
+        _MODEL = load_or_train_model()
+    return _MODEL
+
+def __getattr__(name):
+    if name == "model":
+        return get_model()
+    if name == "StreamingIdfTransformer":
+        return _streaming_idf_class()
+    for module, names in _MOVED.items():
+        if name in names:
+            import importlib
+
+            return getattr(importlib.import_module(module), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ---------- PREDICTION API ----------
+# `docs` are token lists or raw strings; see analyze_tokens.
+def _score_rows(model, docs):
+    with METRICS.stage("vectorize", len(docs)):
+        X = model[:-1].transform(docs)
+    return _score_matrix(model, X)
+
+def _score_matrix(model, X):
+    return _proba_rows(model.classes_, _classify(model, X))
+
+def _classify(model, X):
+    with METRICS.stage("classify", X.shape[0]):
+        return model[-1].predict_proba(X)
+
+def _proba_rows(classes, proba):
+    rows = []
+    for row in proba:
+        best = row.argmax()
+        rows.append({
+            "prediction": str(classes[best]),
+            "confidence": round(float(row[best]), 4),
+            "probabilities": {str(label): round(float(p), 4) for label, p in zip(classes, row)},
+        })
+    return rows
+
+class PersonalityPredictor:
+    def __init__(self, model_path=MODEL_PATH, model=None):
+        self.model_path = model_path
+        self._model = model
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = get_model() if self.model_path == MODEL_PATH else load_or_train_model(self.model_path)
+        return self._model
+
+    @property
+    def classes(self):
+        return [str(c) for c in self.model.classes_]
+
+    def predict_text(self, text):
+        return self.predict_many([text])[0]
+
+    def predict_pdf(self, pdf_path, max_tokens=None, cache=None, page_workers=1):
+        return _score_rows(self.model, [pdf_tokens(pdf_path, cache, max_tokens, page_workers)])[0]
+
+    # Every text goes through one predict_proba call on the stacked matrix.
+    def predict_many(self, texts):
+        with METRICS.stage("preprocess", len(texts)):
+            docs = [tokenize(text) for text in texts]
+        if not docs:
+            return []
+        return _score_rows(self.model, docs)
+
+    def trait_scores(self, texts):
+        return trait_scores([tokenize(text) for text in texts], self.model)
+
+# ---------- TRAIT SCORES ----------
+# One row of five float32 scores per document, columns in TRAITS order, taken
+# from predict_proba on the whole batch and expressed as percentages (each row
+# sums to 100). Deterministic for a given model, unlike the old random display
+# scores.
+def _trait_columns(model):
+    classes = [str(c) for c in model.classes_]
+    missing = [trait for trait in TRAITS if trait not in classes]
+    if missing:
+        raise ValueError(f"model has no class for {missing}")
+    return [classes.index(trait) for trait in TRAITS]
+
+def _trait_matrix(model, X):
+    return _trait_percentages(model, _classify(model, X))
+
+def _trait_percentages(model, proba):
+    import numpy as np
+
+    return (proba[:, _trait_columns(model)] * 100).astype(np.float32)
+
+def trait_scores(docs, model=None):
+    import numpy as np
+
+    model = model if model is not None else get_model()
+    _trait_columns(model)
+    if not len(docs):
+        return np.empty((0, len(TRAITS)), dtype=np.float32)
+    with METRICS.stage("vectorize", len(docs)):
+        X = model[:-1].transform(docs)
+    return _trait_matrix(model, X)
+
+# ---------- BATCH: Collect Inputs ----------
+# A directory is scanned recursively for PDFs; any other file is read as a
+# manifest with one PDF path per line (relative paths resolve next to it).
+def list_pdf_inputs(source):
+    if os.path.isdir(source):
+        paths = []
+        for root, _dirs, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(".pdf"):
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as fh:
+        lines = [line.strip() for line in fh]
+    return [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+
+# Command-line inputs: PDF files, directories, manifests and glob patterns
+# (`**` matches any depth), flattened into one sorted list without duplicates.
+def expand_inputs(inputs):
+    import glob
+
+    paths = set()
+    for item in inputs:
+        if glob.has_magic(item):
+            paths.update(path for path in glob.iglob(item, recursive=True)
+                         if path.lower().endswith(".pdf") and os.path.isfile(path))
+        elif os.path.isfile(item) and item.lower().endswith(".pdf"):
+            paths.add(item)
+        else:
+            paths.update(list_pdf_inputs(item))
+    return sorted(paths)
+
+# ---------- BATCH: Extract + Clean (runs in worker processes) ----------
+# With collect=True (or a cache, whose written bytes the parent accounts for)
+# the worker's per-document measurements come back as the fourth element.
+def _extract_and_clean(pdf_path, cache=None, collect=False):
+    stats = {} if collect or cache is not None else None
+    try:
+        return pdf_path, pdf_tokens(pdf_path, cache, stats=stats), None, stats
+    except Exception as e:
+        return pdf_path, None, f"{type(e).__name__}: {e}", stats
+
+# ---------- BATCH: Predict ----------
+# Text extraction fans out over a process pool; the classifier then runs once
+# on the stacked TF-IDF matrix of every document that parsed. With an index,
+# that same matrix is added to it under each file's path. With a Deduplicator,
+# near-duplicates are not scored but get their representative's result, and
+# "duplicate_of" names that representative. The index (personality_index) and
+# the deduplicator (personality_dedup) are passed in, so they are only imported
+# by callers that use them.
+# Predict_proba rows (model class order) for every parsed (path, tokens) pair,
+# plus the representative path each near-duplicate's row was copied from (None
+# for documents scored themselves). Only scored documents go into the index.
+def _batch_proba(model, parsed, index=None, dedup=None):
+    import numpy as np
+
+    paths = [path for path, _tokens in parsed]
+    duplicate_of = [None] * len(parsed)
+    proba = np.empty((len(parsed), len(model.classes_)))
+    todo = list(range(len(parsed)))
+    if dedup is not None:
+        with METRICS.stage("dedup", len(parsed)):
+            assigned = dedup.assign(paths, [tokens for _path, tokens in parsed])
+        todo = [i for i, (_rep, new) in enumerate(assigned) if new]
+    if todo:
+        with METRICS.stage("vectorize", len(todo)):
+            X = model[:-1].transform([parsed[i][1] for i in todo])
+        proba[todo] = _classify(model, X)
+        if index is not None:
+            index.add_vectors([paths[i] for i in todo], X)
+    if dedup is not None:
+        for i in todo:
+            dedup.remember(assigned[i][0], proba[i])
+        for i, (rep, new) in enumerate(assigned):
+            if not new:
+                proba[i] = dedup.proba(rep)
+                duplicate_of[i] = dedup.ids[rep]
+        METRICS.inc("personality_duplicates_total", len(parsed) - len(todo))
+    return proba, duplicate_of
+
+def _extract_docs(pdf_paths, workers, chunksize, cache):
+    collect = METRICS.enabled
+    if workers == 1:
+        docs = [_extract_and_clean(path, cache, collect) for path in pdf_paths]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+
+        worker_cache = cache.for_workers() if cache is not None else None
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            docs = list(pool.map(partial(_extract_and_clean, cache=worker_cache, collect=collect), pdf_paths,
+                                 chunksize=chunksize))
+        written = sum((stats or {}).get("cache_bytes", 0) for _path, _tokens, _error, stats in docs)
+        if written:
+            cache.account(written)
+    if collect:
+        for _path, _tokens, error, stats in docs:
+            if error is None:
+                METRICS.observe_doc(stats)
+            else:
+                METRICS.inc("personality_stage_errors_total", stage="extract")
+    return docs
+
+def predict_batch(pdf_paths, workers=None, chunksize=8, predictor=None, cache=None, index=None, dedup=None):
+    predictor = predictor or PersonalityPredictor()
+    docs = _extract_docs(list(pdf_paths), workers, chunksize, cache)
+    parsed = [(path, tokens) for path, tokens, error, _stats in docs if error is None]
+    scored = {}
+    if parsed:
+        model = predictor.model
+        proba, duplicate_of = _batch_proba(model, parsed, index, dedup)
+        rows = _proba_rows(model.classes_, proba)
+        scored = {path: {**row, "tokens": len(tokens), "duplicate_of": rep}
+                  for (path, tokens), row, rep in zip(parsed, rows, duplicate_of)}
+
+    results = []
+    for path, _text, error, _stats in docs:
+        if error is None:
+            results.append({"file": path, **scored[path], "error": None})
+        else:
+            results.append({"file": path, "prediction": None, "confidence": None,
+                            "probabilities": None, "tokens": 0, "duplicate_of": None, "error": error})
+    return results
+
+# The same batch as columns for a ResultStore, without a dict per document:
+# {"id", "label" (uint8 TRAITS codes), "scores" ((n, 5) float32 percentages),
+# "tokens" (int32), "duplicate_of", "error"}. Failed documents get NO_LABEL
+# and NaN scores.
+def predict_batch_columns(pdf_paths, workers=None, chunksize=8, predictor=None, cache=None, index=None,
+                          dedup=None):
+    import numpy as np
+
+    from personality_results import NO_LABEL
+
+    predictor = predictor or PersonalityPredictor()
+    docs = _extract_docs(list(pdf_paths), workers, chunksize, cache)
+    ok = np.array([error is None for _path, _tokens, error, _stats in docs], dtype=bool)
+    columns = {
+        "id": [path for path, _tokens, _error, _stats in docs],
+        "label": np.full(len(docs), NO_LABEL, dtype=np.uint8),
+        "scores": np.full((len(docs), len(TRAITS)), np.nan, dtype=np.float32),
+        "tokens": np.array([len(tokens) if tokens is not None else 0 for _path, tokens, _error, _stats in docs],
+                           dtype=np.int32),
+        "duplicate_of": [None] * len(docs),
+        "error": [error for _path, _tokens, error, _stats in docs],
+    }
+    if ok.any():
+        model = predictor.model
+        parsed = [(path, tokens) for path, tokens, error, _stats in docs if error is None]
+        proba, duplicate_of = _batch_proba(model, parsed, index, dedup)
+        scores = _trait_percentages(model, proba)
+        columns["scores"][ok] = scores
+        columns["label"][ok] = scores.argmax(axis=1)
+        for row, rep in zip(np.flatnonzero(ok), duplicate_of):
+            columns["duplicate_of"][row] = rep
+    return columns
+
+# ---------- BATCH: Write Predictions ----------
+# With append=True rows are added to an existing file (no second CSV header)
+# and synced to disk before returning, as resumable runs rely on that.
+def write_predictions(results, out_path, labels=None, append=False):
+    mode = "a" if append else "w"
+    if out_path.lower().endswith(".csv"):
+        labels = labels or PersonalityPredictor().classes
+        with open(out_path, mode, newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            if not append or fh.tell() == 0:
+                writer.writerow(["file", "prediction", "confidence", *labels, "tokens", "duplicate_of", "error"])
+            for r in results:
+                probs = r["probabilities"] or {}
+                writer.writerow([r["file"], r["prediction"], r["confidence"],
+                                 *[probs.get(label, "") for label in labels], r["tokens"],
+                                 r.get("duplicate_of") or "", r["error"] or ""])
+            if append:
+                fh.flush()
+                os.fsync(fh.fileno())
+    else:
+        with open(out_path, mode, encoding="utf-8") as fh:
+            for r in results:
+                fh.write(json.dumps(r, ensure_ascii=False) + "\n")
+            if append:
+                fh.flush()
+                os.fsync(fh.fileno())
+
+# ---------- BATCH: Resumable Runs ----------
+# Inputs are scored chunk_size files at a time. After each chunk its rows are
+# appended to the output and synced, and then a line naming the chunk's files
+# and the output size (bytes of a CSV/JSONL file, rows of a ResultStore) is
+# appended to `<output>.journal`. A rerun with the same output reads the
+# journal, truncates the output back to the last recorded size (dropping rows
+# of a chunk that crashed half-written), skips every file already journaled
+# and carries on. The journal is removed once the run completes; restart=True
+# ignores it and starts over. One dedup instance serves every chunk; it is not
+# journaled, so after a resume only the resumed files are matched against each
+# other.
+FILE_FORMATS = ("jsonl", "csv")
+OUTPUT_FORMATS = FILE_FORMATS + ("npy", "parquet")   # the last two: personality_results.RESULT_FORMATS
+
+def output_format(out_path):
+    lower = out_path.lower()
+    if lower.endswith(".csv"):
+        return "csv"
+    if lower.endswith(".parquet"):
+        return "parquet"
+    return "jsonl"
+
+class _FileOutput:
+    def __init__(self, path, labels):
+        self.path, self.labels = path, labels
+
+    def reset(self):
+        write_predictions([], self.path, self.labels)
+
+    def size(self):
+        return os.path.getsize(self.path)
+
+    def truncate(self, size):
+        os.truncate(self.path, size)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def write(self, pdf_paths, **kwargs):
+        results = predict_batch(pdf_paths, **kwargs)
+        write_predictions(results, self.path, self.labels, append=True)
+        failed = sum(1 for r in results if r["error"])
+        duplicates = sum(1 for r in results if r["duplicate_of"])
+        return len(results) - failed, failed, duplicates, sum(r["tokens"] for r in results)
+
+class _StoreOutput:
+    def __init__(self, path, fmt):
+        self.path, self.fmt = path, fmt
+
+    def _store(self):
+        from personality_results import ResultStore
+
+        return ResultStore(self.path, self.fmt)
+
+    def reset(self):
+        self._store().truncate(0)
+
+    def size(self):
+        return len(self._store())
+
+    def truncate(self, size):
+        self._store().truncate(size)
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, "manifest.json"))
+
+    def write(self, pdf_paths, **kwargs):
+        columns = predict_batch_columns(pdf_paths, **kwargs)
+        with self._store() as store:
+            store.append_columns(columns)
+        failed = sum(1 for error in columns["error"] if error)
+        duplicates = sum(1 for rep in columns["duplicate_of"] if rep)
+        return len(columns["id"]) - failed, failed, duplicates, int(columns["tokens"].sum())
+
+def _read_journal(journal_path):
+    done, output_size = set(), 0
+    with open(journal_path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # torn last line from a crash
+            done.update(entry["files"])
+            output_size = entry["output_size"]
+    return done, output_size
+
+def _append_journal(journal_path, files, output_size):
+    with open(journal_path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"output_size": output_size, "files": files}, ensure_ascii=False) + "\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+
+def run_batch(pdf_paths, out_path, workers=None, chunk_size=1000, cache=None, index=None,
+              predictor=None, restart=False, fmt=None, dedup=None, log=print):
+    predictor = predictor or PersonalityPredictor()
+    fmt = fmt or output_format(out_path)
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"fmt must be one of {OUTPUT_FORMATS}, got {fmt!r}")
+    journal_path = out_path.rstrip("/\\") + ".journal"
+    pdf_paths = list(pdf_paths)
+    if fmt in FILE_FORMATS:
+        output = _FileOutput(out_path, predictor.classes)
+    else:
+        output = _StoreOutput(out_path, fmt)
+    done = set()
+    if os.path.exists(journal_path) and not restart and output.exists():
+        done, output_size = _read_journal(journal_path)
+        output.truncate(output_size)
+        log(f"↻ Resuming: {len(done):,} files already scored in {out_path}")
+    else:
+        if os.path.exists(journal_path):
+            if not restart:
+                log(f"⚠️ {out_path} is missing; ignoring {journal_path} and starting over")
+            os.remove(journal_path)
+        output.reset()
+
+    todo = [path for path in pdf_paths if path not in done]
+    summary = {"files": len(pdf_paths), "skipped": len(pdf_paths) - len(todo), "scored": 0, "failed": 0,
+               "duplicates": 0, "tokens": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    for start in range(0, len(todo), chunk_size):
+        chunk = todo[start:start + chunk_size]
+        scored, failed, duplicates, tokens = output.write(chunk, workers=workers, cache=cache,
+                                                          predictor=predictor, index=index, dedup=dedup)
+        if index is not None:
+            index.save()
+        _append_journal(journal_path, chunk, output.size())
+        summary["scored"] += scored
+        summary["failed"] += failed
+        summary["duplicates"] += duplicates
+        summary["tokens"] += tokens
+        processed = summary["skipped"] + start + len(chunk)
+        elapsed = time.perf_counter() - started
+        log(f"✅ {processed:,}/{len(pdf_paths):,} files ({processed / max(len(pdf_paths), 1):.1%}), "
+            f"{(start + len(chunk)) / max(elapsed, 1e-9):,.1f} files/sec")
+    summary["seconds"] = time.perf_counter() - started
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+    return summary
+
+# ---------- OUTPUT ----------
+#   python personality_predictor.py                       # score cv_sample.pdf
+#   python personality_predictor.py predict "cvs/**/*.pdf" more/ list.txt -o out.csv -w 8 --chunk-size 1000
+#   python personality_predictor.py predict cvs/ -o results/ -f npy    # or -o results.parquet
+#   python personality_predictor.py similar cv.pdf -k 10
+#   python personality_predictor.py train corpus.jsonl --chunk-size 10000
+#   python personality_predictor.py compare-features corpus.jsonl
+#
+# predict is the default command, so `python personality_predictor.py cvs/`
+# works too. It takes PDF files, directories, glob patterns (quoted; ** recurses)
+# and manifest files. It reuses cleaned text from the cache and adds every
+# scored CV to the similarity index unless --no-cache / --no-index (or
+# PERSONALITY_NO_CACHE / PERSONALITY_NO_INDEX) are given, scores only one CV
+# per cluster of near-duplicates with --dedup, and resumes an interrupted run
+# over the same output (see run_batch). train resumes from its
+# checkpoint, and compare-features reports accuracy, fit time and peak RSS for
+# the TF-IDF and hashed feature modes.
+# With PERSONALITY_METRICS_FILE set, every command ends by writing its metrics
+# there in Prometheus text format.
+COMMANDS = ("predict", "similar", "train", "compare-features")
+
+def build_arg_parser():
+    import argparse
+
+    from personality_dedup import DEDUP_THRESHOLD
+
+    parser = argparse.ArgumentParser(prog="personality_predictor.py",
+                                     description="Predict Big Five personality traits from CVs.")
+    commands = parser.add_subparsers(dest="command")
+
+    predict = commands.add_parser("predict", help="score PDFs in bulk")
+    predict.add_argument("inputs", nargs="+", help="PDF files, directories, glob patterns or manifest files")
+    predict.add_argument("-o", "--output", default="predictions.jsonl",
+                         help="output file (.jsonl, .csv) or result store directory")
+    predict.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default=None,
+                         help="jsonl/csv files, or a columnar npy/parquet result store "
+                              "(default: from the output's extension, else jsonl)")
+    predict.add_argument("-w", "--workers", type=int, default=None,
+                         help="text extraction processes (default: CPU count)")
+    predict.add_argument("--chunk-size", type=int, default=1000,
+                         help="files per chunk; progress is journaled after each chunk")
+    predict.add_argument("--restart", action="store_true", help="ignore the progress journal and start over")
+    predict.add_argument("--dedup", nargs="?", type=float, const=DEDUP_THRESHOLD, default=None, metavar="THRESHOLD",
+                         help="score one representative per cluster of near-duplicate CVs "
+                              f"(estimated Jaccard similarity, default {DEDUP_THRESHOLD})")
+    predict.add_argument("--no-cache", action="store_true", default=bool(os.environ.get("PERSONALITY_NO_CACHE")),
+                         help="always re-extract text instead of using the text cache")
+    predict.add_argument("--no-index", action="store_true", default=bool(os.environ.get("PERSONALITY_NO_INDEX")),
+                         help="do not add scored CVs to the similarity index")
+
+    similar = commands.add_parser("similar", help="list indexed CVs that read most like a PDF")
+    similar.add_argument("pdf")
+    similar.add_argument("-k", type=int, default=10)
+
+    train = commands.add_parser("train", help="train the hashed model out of core on a labeled JSONL corpus")
+    train.add_argument("corpus")
+    train.add_argument("--chunk-size", type=int, default=10000)
+
+    compare = commands.add_parser("compare-features", help="compare the TF-IDF and hashed feature modes")
+    compare.add_argument("corpus")
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] not in COMMANDS and argv[0] not in ("-h", "--help"):
+        argv.insert(0, "predict")
+    args = build_arg_parser().parse_args(argv)
+
+    if args.command == "compare-features":
+        for report in compare_feature_modes(args.corpus):
+            print(json.dumps(report))
+    elif args.command == "train":
+        try:
+            train_incremental(args.corpus, chunk_size=args.chunk_size)
+        except KeyboardInterrupt:
+            sys.exit(130)
+    elif args.command == "similar":
+        from personality_index import SimilarityIndex
+
+        index = SimilarityIndex()
+        print(f"🔎 CVs most similar to {args.pdf} ({len(index):,} indexed):")
+        for match in index.query([pdf_tokens(args.pdf)], args.k)[0]:
+            print(f"- {match['score']:.3f}  {match['id']}")
+    elif args.command == "predict":
+        from personality_dedup import Deduplicator
+        from personality_index import SimilarityIndex
+
+        pdf_paths = expand_inputs(args.inputs)
+        cache = None if args.no_cache else TextCache()
+        predictor = PersonalityPredictor()
+        predictor.model  # load before timing
+        index = None
+        if not args.no_index:
+            try:
+                index = SimilarityIndex(model=predictor.model)
+            except ValueError as e:
+                print(f"⚠️ Not indexing: {e}")
+        dedup = Deduplicator(args.dedup) if args.dedup is not None else None
+        try:
+            summary = run_batch(pdf_paths, args.output, workers=args.workers, chunk_size=args.chunk_size,
+                                cache=cache, index=index, predictor=predictor, restart=args.restart,
+                                fmt=args.format, dedup=dedup)
+        except KeyboardInterrupt:
+            print(f"💾 Interrupted; rerun the same command to resume {args.output}")
+            sys.exit(130)
+        total = summary["scored"] + summary["failed"]
+        print(f"📄 Scored {summary['scored']}/{total} CVs → {args.output}"
+              + (f" ({summary['skipped']:,} done earlier)" if summary["skipped"] else ""))
+        if dedup is not None:
+            print(f"🧬 {summary['duplicates']:,} near-duplicates reused their representative's result")
+        print(f"⏱ {summary['seconds']:.2f}s, {summary['tokens'] / max(summary['seconds'], 1e-9):,.0f} tokens/sec")
+    else:
+        tokens = pdf_tokens("cv_sample.pdf")
+        scores = trait_scores([tokens])[0]
+        prediction = TRAITS[scores.argmax()]
+
+        print("🧠 Predicted Dominant Personality Trait:", prediction)
+        print("📊 Trait Scores:")
+        for trait, score in zip(TRAITS, scores):
+            print(f"- {trait}: {score:.1f}%")
+
+    metrics_file = os.environ.get("PERSONALITY_METRICS_FILE")
+    if metrics_file:
+        METRICS.dump(metrics_file)
+
+# Run through the importable module rather than __main__, so pickled
+# references (the saved pipeline's analyzer, pool workers) resolve in any process.
+if __name__ == "__main__":
+    import personality_predictor
+
+    personality_predictor.main()
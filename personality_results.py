@@ -0,0 +1,259 @@
+# ---------- IMPORTS ----------
+import json
+import os
+
+from personality_predictor import TRAITS
+
+# ---------- RESULT STORE ----------
+# Columnar batch results: one row per document with its id, the predicted
+# trait as a uint8 code into TRAITS (NO_LABEL for documents that failed), the
+# five float32 trait scores (percentages, TRAITS order, NaN on failure) and the
+# token count. Rows are buffered by append() and written by flush().
+#
+# fmt="npy" keeps a directory of plain .npy files (label, scores, tokens) that
+# grow in place: rows are appended after the data, then the fixed-size header
+# is rewritten with the new shape, and manifest.json (the commit point) records
+# the row count. Ids are JSON strings, one per line, in ids.jsonl. Error
+# messages and, for deduplicated runs, the representative each near-duplicate
+# copied its result from are sparse, so they go to errors.jsonl and
+# duplicates.jsonl as {"row", "id", ...} records. load_results() memory-maps the arrays, so opening
+# millions of rows costs a few page faults. A store reopened after a crash is
+# cut back to the rows its manifest committed.
+#
+# fmt="parquet" needs pyarrow and writes one part-NNNNN.parquet per flush, with
+# the label as a dictionary column and one float32 column per trait; read the
+# directory with pyarrow.dataset or pandas.read_parquet.
+RESULT_FORMATS = ("npy", "parquet")
+RESULT_FORMAT_VERSION = 1
+NO_LABEL = 255
+_NPY_COLUMNS = (("label", "uint8", ()), ("scores", "float32", (len(TRAITS),)), ("tokens", "int32", ()))
+_SIDECARS = (("errors", "error"), ("duplicates", "duplicate_of"))
+
+class ResultStore:
+    def __init__(self, directory, fmt="npy"):
+        if fmt not in RESULT_FORMATS:
+            raise ValueError(f"fmt must be one of {RESULT_FORMATS}, got {fmt!r}")
+        if fmt == "parquet":
+            import importlib.util
+
+            if importlib.util.find_spec("pyarrow") is None:
+                raise ImportError("fmt='parquet' needs pyarrow (pip install pyarrow)")
+        self.directory = directory
+        self.fmt = fmt
+        self._buffer = []
+        os.makedirs(directory, exist_ok=True)
+        try:
+            manifest = _load_result_manifest(directory)
+        except FileNotFoundError:
+            manifest = {"format_version": RESULT_FORMAT_VERSION, "format": fmt, "traits": list(TRAITS),
+                        "rows": 0, "ids_bytes": 0, "errors_bytes": 0, "duplicates_bytes": 0, "parts": []}
+        if manifest["format"] != fmt:
+            raise ValueError(f"{directory} holds {manifest['format']} results, not {fmt}")
+        if manifest["traits"] != list(TRAITS):
+            raise ValueError(f"{directory} was written for traits {manifest['traits']}")
+        self._manifest = manifest
+        self._recover()
+        self._write_manifest()
+
+    def __len__(self):
+        return self._manifest["rows"] + sum(len(block[0]) for block in self._buffer)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _write_manifest(self):
+        tmp_path = self._path("manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self._manifest, fh, indent=2)
+        os.replace(tmp_path, self._path("manifest.json"))
+
+    # Drops whatever a crashed flush wrote past the committed rows.
+    def _recover(self):
+        if self.fmt == "parquet":
+            parts = {part["name"] for part in self._manifest["parts"]}
+            for name in os.listdir(self.directory):
+                if name.startswith("part-") and name not in parts:
+                    os.remove(self._path(name))
+            return
+        rows = self._manifest["rows"]
+        for name, dtype, tail in _NPY_COLUMNS:
+            _npy_resize(self._path(name + ".npy"), dtype, tail, rows)
+        for name in ("ids", *(sidecar for sidecar, _field in _SIDECARS)):
+            with open(self._path(name + ".jsonl"), "ab") as fh:
+                fh.truncate(self._manifest.get(name + "_bytes", 0))
+
+    # labels are TRAITS codes (NO_LABEL for failures); scores are (n, 5).
+    def append(self, ids, labels, scores, tokens, errors=None, duplicate_of=None):
+        import numpy as np
+
+        ids = [str(doc_id) for doc_id in ids]
+        labels = np.asarray(labels, dtype=np.uint8)
+        scores = np.asarray(scores, dtype=np.float32).reshape(len(ids), len(TRAITS))
+        tokens = np.asarray(tokens, dtype=np.int32)
+        if not len(ids) == len(labels) == len(tokens):
+            raise ValueError("ids, labels, scores and tokens must have the same number of rows")
+        self._buffer.append((ids, labels, scores, tokens, list(errors or [None] * len(ids)),
+                             list(duplicate_of or [None] * len(ids))))
+
+    def append_columns(self, columns):
+        self.append(columns["id"], columns["label"], columns["scores"], columns["tokens"], columns["error"],
+                    columns.get("duplicate_of"))
+
+    def flush(self):
+        import numpy as np
+
+        if not self._buffer:
+            return
+        ids = [doc_id for block in self._buffer for doc_id in block[0]]
+        labels = np.concatenate([block[1] for block in self._buffer])
+        scores = np.concatenate([block[2] for block in self._buffer])
+        tokens = np.concatenate([block[3] for block in self._buffer])
+        sparse = {"error": [error for block in self._buffer for error in block[4]],
+                  "duplicate_of": [rep for block in self._buffer for rep in block[5]]}
+        if self.fmt == "parquet":
+            self._flush_parquet(ids, labels, scores, tokens, sparse)
+        else:
+            self._flush_npy(ids, labels, scores, tokens, sparse)
+        self._buffer = []
+
+    def _flush_npy(self, ids, labels, scores, tokens, sparse):
+        rows = self._manifest["rows"]
+        for (name, _dtype, _tail), values in zip(_NPY_COLUMNS, (labels, scores, tokens)):
+            with open(self._path(name + ".npy"), "ab") as fh:
+                fh.write(values.tobytes())
+                fh.flush()
+                os.fsync(fh.fileno())
+        with open(self._path("ids.jsonl"), "ab") as fh:
+            fh.write("".join(json.dumps(doc_id, ensure_ascii=False) + "\n" for doc_id in ids).encode("utf-8"))
+            fh.flush()
+            os.fsync(fh.fileno())
+            committed = {"ids_bytes": fh.tell()}
+        for name, field in _SIDECARS:
+            with open(self._path(name + ".jsonl"), "ab") as fh:
+                for row, (doc_id, value) in enumerate(zip(ids, sparse[field]), rows):
+                    if value is not None:
+                        fh.write((json.dumps({"row": row, "id": doc_id, field: value}, ensure_ascii=False)
+                                  + "\n").encode("utf-8"))
+                fh.flush()
+                os.fsync(fh.fileno())
+                committed[name + "_bytes"] = fh.tell()
+        for name, dtype, tail in _NPY_COLUMNS:
+            _npy_resize(self._path(name + ".npy"), dtype, tail, rows + len(ids))
+        self._manifest.update(rows=rows + len(ids), **committed)
+        self._write_manifest()
+
+    def _flush_parquet(self, ids, labels, scores, tokens, sparse):
+        import numpy as np
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        codes = pa.array(labels.astype(np.int8), mask=labels == NO_LABEL)
+        columns = {
+            "id": pa.array(ids, pa.string()),
+            "label": pa.DictionaryArray.from_arrays(codes, pa.array(TRAITS, pa.string())),
+            **{trait.lower(): pa.array(scores[:, i]) for i, trait in enumerate(TRAITS)},
+            "tokens": pa.array(tokens),
+            "duplicate_of": pa.array(sparse["duplicate_of"], pa.string()),
+            "error": pa.array(sparse["error"], pa.string()),
+        }
+        name = f"part-{len(self._manifest['parts']):05d}.parquet"
+        tmp_path = self._path(name + ".tmp")
+        pq.write_table(pa.table(columns), tmp_path)
+        os.replace(tmp_path, self._path(name))
+        self._manifest["parts"].append({"name": name, "rows": len(ids)})
+        self._manifest["rows"] += len(ids)
+        self._write_manifest()
+
+    # Cuts the store back to its first `rows` rows (used when resuming a run).
+    # Parquet stores can only be cut at a part boundary.
+    def truncate(self, rows):
+        self._buffer = []
+        if rows >= self._manifest["rows"]:
+            return
+        if self.fmt == "parquet":
+            kept, total = [], 0
+            for part in self._manifest["parts"]:
+                if total + part["rows"] > rows:
+                    break
+                kept.append(part)
+                total += part["rows"]
+            if total != rows:
+                raise ValueError(f"{self.directory}: {rows} is not at a part boundary")
+            self._manifest.update(parts=kept, rows=rows)
+            self._write_manifest()
+            self._recover()
+            return
+        ids_bytes = 0
+        with open(self._path("ids.jsonl"), "rb") as fh:
+            for _ in range(rows):
+                ids_bytes += len(fh.readline())
+        self._manifest.update(rows=rows, ids_bytes=ids_bytes)
+        for name, _field in _SIDECARS:
+            path = self._path(name + ".jsonl")
+            with open(path, encoding="utf-8") as fh:
+                kept = [line for line in fh if json.loads(line)["row"] < rows]
+            with open(path + ".tmp", "w", encoding="utf-8") as fh:
+                fh.writelines(kept)
+            os.replace(path + ".tmp", path)
+            self._manifest[name + "_bytes"] = os.path.getsize(path)
+        self._write_manifest()
+        self._recover()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def _load_result_manifest(directory):
+    with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    if manifest.get("format_version") != RESULT_FORMAT_VERSION:
+        raise ValueError(f"{directory}: result format {manifest.get('format_version')} != {RESULT_FORMAT_VERSION}")
+    return manifest
+
+# Creates the file if needed, then sets its header to `rows` rows and drops
+# any bytes past them. NumPy pads the header so the row count can grow to 21
+# digits without changing its length, which keeps the data offset fixed.
+def _npy_resize(path, dtype, tail, rows):
+    import numpy as np
+
+    dtype = np.dtype(dtype)
+    with open(path, "r+b" if os.path.exists(path) else "w+b") as fh:
+        np.lib.format.write_array_header_1_0(
+            fh, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows, *tail)})
+        offset = fh.tell()
+        fh.truncate(offset + rows * dtype.itemsize * int(np.prod(tail, dtype=np.int64)))
+        fh.flush()
+        os.fsync(fh.fileno())
+    return offset
+
+# npy stores: {"id", "label", "scores", "tokens", "traits", "errors",
+# "duplicates"} with the arrays memory-mapped read-only; ids=False skips
+# reading the id file. Parquet stores come back as a pyarrow Table.
+def load_results(directory, ids=True):
+    import numpy as np
+
+    manifest = _load_result_manifest(directory)
+    if manifest["format"] == "parquet":
+        import pyarrow.dataset as ds
+
+        return ds.dataset([os.path.join(directory, part["name"]) for part in manifest["parts"]],
+                          format="parquet").to_table()
+    results = {"traits": tuple(manifest["traits"])}
+    for name, _dtype, _tail in _NPY_COLUMNS:
+        results[name] = np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")[:manifest["rows"]]
+    if ids:
+        # One JSON string per line, so the committed bytes parse as a single array.
+        with open(os.path.join(directory, "ids.jsonl"), "rb") as fh:
+            text = fh.read(manifest["ids_bytes"]).decode("utf-8")
+        results["id"] = json.loads("[" + text.rstrip("\n").replace("\n", ",") + "]")
+    for name, _field in _SIDECARS:
+        with open(os.path.join(directory, name + ".jsonl"), "rb") as fh:
+            lines = fh.read(manifest.get(name + "_bytes", 0)).decode("utf-8").splitlines()
+        results[name] = [json.loads(line) for line in lines]
+    return results
@@ -0,0 +1,357 @@
+# ---------- IMPORTS ----------
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qs
+
+from personality_index import INDEX_DIR, SimilarityIndex
+from personality_predictor import (
+    CACHE_DIR,
+    METRICS,
+    PersonalityPredictor,
+    TOKEN_BUCKETS,
+    TextCache,
+    _score_rows,
+    pdf_tokens,
+    tokenize,
+)
+
+# Local inference service around the TF-IDF + MultinomialNB pipeline.
+#
+#   python personality_server.py --port 8000 --max-batch-size 32 --max-wait-ms 5
+#
+#   curl -X POST --data-binary @cv.pdf -H "Content-Type: application/pdf" localhost:8000/predict
+#   curl -X POST -d "team player, public speaker" -H "Content-Type: text/plain" localhost:8000/predict
+#   curl -X POST -F "file=@cv.pdf" localhost:8000/predict
+#   curl -X POST --data-binary @cv.pdf -H "Content-Type: application/pdf" "localhost:8000/similar?k=5"
+#   curl localhost:8000/metrics          # with --metrics
+#
+# Concurrent requests are queued and scored together: the batcher waits at most
+# --max-wait-ms after the first queued request (or until --max-batch-size requests
+# are waiting) and then runs a single predict_proba over the whole batch.
+# /similar answers from the similarity index as it was when the server started;
+# batch runs that add to it are picked up on restart.
+
+MAX_BODY_BYTES = 50 * 1024 * 1024
+SPOOL_UPLOAD_BYTES = 1024 * 1024   # PDFs at least this large reach the PDF workers through a temp file
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+ROUTES = ("/health", "/predict", "/similar", "/metrics")
+
+# close=True ends the connection after the response: the request body was not
+# (or not fully) consumed, so the next bytes on the socket are not a request line.
+class HTTPError(Exception):
+    def __init__(self, status, message, close=False):
+        super().__init__(message)
+        self.status = status
+        self.close = close
+
+METRICS.help.update({
+    "personality_http_requests_total": "HTTP requests by path and status.",
+    "personality_batch_size": "Requests scored together by the micro-batcher.",
+})
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+# ---------- PDF WORK (runs in the executor) ----------
+# The executor is a process pool, so measurements come back with the tokens.
+# The body is read into memory once; arguments to the pool are pickled, so a
+# small upload is copied to the worker, which parses those bytes in place
+# (see personality_predictor.BufferStream). A large upload would be pickled,
+# piped and unpickled into two more full copies, so it is written to a temp
+# file instead and the worker memory-maps that path like any CLI input.
+def _pdf_bytes_tokens(data, collect=False):
+    stats = {} if collect else None
+    return pdf_tokens(data, stats=stats), stats
+
+def _spool_upload(data):
+    fd, path = tempfile.mkstemp(prefix="cv-upload-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    return path
+
+def _sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+# ---------- MICRO-BATCHER ----------
+class MicroBatcher:
+    def __init__(self, predictor, max_batch_size=32, max_wait_ms=5.0):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, tokens):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((tokens, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        model = self.predictor.model
+        while True:
+            batch = await self._collect()
+            docs = [tokens for tokens, _future in batch]
+            try:
+                rows = await loop.run_in_executor(None, _score_rows, model, docs)
+            except Exception as e:
+                for _text, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            METRICS.observe("personality_batch_size", len(batch), BATCH_SIZE_BUCKETS)
+            for (_text, future), row in zip(batch, rows):
+                if not future.done():
+                    future.set_result({**row, "batch_size": len(batch)})
+
+# ---------- REQUEST BODY ----------
+# Returns ("pdf", bytes) or ("text", str) for raw PDF, plain text, JSON
+# {"text": ...} and multipart/form-data uploads (a "file" part or a "text" field).
+def parse_payload(content_type, body):
+    mime = content_type.split(";", 1)[0].strip().lower()
+    if mime == "application/pdf" or (not mime and body.startswith(b"%PDF")):
+        return "pdf", body
+    if mime in ("text/plain", ""):
+        return "text", body.decode("utf-8", errors="replace")
+    if mime == "application/json":
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(payload, dict) or not isinstance(payload.get("text"), str):
+            raise HTTPError(400, 'expected a JSON object with a "text" string')
+        return "text", payload["text"]
+    if mime == "multipart/form-data":
+        message = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+        )
+        for part in message.iter_parts():
+            data = part.get_payload(decode=True) or b""
+            if part.get_content_type() == "application/pdf" or (part.get_filename() or "").lower().endswith(".pdf"):
+                return "pdf", data
+            if part.get_param("name", header="content-disposition") == "text":
+                return "text", data.decode(part.get_content_charset() or "utf-8", errors="replace")
+        raise HTTPError(400, 'multipart body needs a PDF file part or a "text" field')
+    raise HTTPError(400, f"unsupported Content-Type {mime!r}")
+
+# ---------- HTTP SERVER ----------
+class PredictionServer:
+    def __init__(self, predictor=None, max_batch_size=32, max_wait_ms=5.0, pdf_executor=None, cache=None,
+                 index=None):
+        self.predictor = predictor or PersonalityPredictor()
+        self.batcher = MicroBatcher(self.predictor, max_batch_size, max_wait_ms)
+        self.pdf_executor = pdf_executor
+        self.cache = cache
+        self.cache_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="text-cache")
+        self.index = index
+        self._batch_task = None
+
+    async def start(self, host="127.0.0.1", port=8000):
+        self._batch_task = asyncio.create_task(self.batcher.run())
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                path, _, query = path.partition("?")
+                try:
+                    body = await self.read_body(reader, method, headers)
+                    status, payload = 200, await self.route(method, path, headers, body, parse_qs(query))
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                    keep_alive = keep_alive and not e.close
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                    keep_alive = False
+                METRICS.inc("personality_http_requests_total", path=path if path in ROUTES else "other",
+                            status=status)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_body(self, reader, method, headers):
+        if method != "POST":
+            return b""
+        if "content-length" not in headers:
+            raise HTTPError(411, "Content-Length is required", close=True)
+        value = headers["content-length"]
+        if not (value.isascii() and value.isdigit()):
+            raise HTTPError(400, f"invalid Content-Length {value!r}", close=True)
+        length = int(value)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"body larger than {MAX_BODY_BYTES} bytes", close=True)
+        return await reader.readexactly(length)
+
+    async def route(self, method, path, headers, body, query=None):
+        if path == "/metrics":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            if not METRICS.enabled:
+                raise HTTPError(404, "metrics are disabled; start the server with --metrics")
+            return METRICS.render()
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            return {"status": "ok", "classes": self.predictor.classes,
+                    "batches": self.batcher.batches, "requests": self.batcher.requests}
+        if path == "/predict":
+            if method != "POST":
+                raise HTTPError(405, "use POST")
+            tokens = await self.payload_tokens(headers, body)
+            return await self.batcher.submit(tokens)
+        if path == "/similar":
+            if method != "POST":
+                raise HTTPError(405, "use POST")
+            if self.index is None:
+                raise HTTPError(404, "no similarity index loaded")
+            try:
+                k = int((query or {}).get("k", ["10"])[0])
+            except ValueError:
+                raise HTTPError(400, "k must be an integer")
+            if k < 1:
+                raise HTTPError(400, "k must be at least 1")
+            tokens = await self.payload_tokens(headers, body)
+            matches = await asyncio.get_running_loop().run_in_executor(None, self.index.query, [tokens], k)
+            return {"matches": matches[0], "indexed": len(self.index)}
+        raise HTTPError(404, f"no route for {path}")
+
+    async def payload_tokens(self, headers, body):
+        kind, data = parse_payload(headers.get("content-type", ""), body)
+        if kind == "pdf":
+            return await self.pdf_tokens(data)
+        with METRICS.stage("preprocess"):
+            tokens = tokenize(data)
+        METRICS.observe("personality_tokens_per_doc", len(tokens), TOKEN_BUCKETS)
+        return tokens
+
+    # A cache hit answers from the stored text without shipping the upload to
+    # the PDF workers at all. Cache file I/O stays off the event loop; writes
+    # (and the evictions they trigger) go through one thread so the running
+    # size is only updated by one writer.
+    async def pdf_tokens(self, data):
+        loop = asyncio.get_running_loop()
+        digest = None
+        if self.cache is not None:
+            digest = await loop.run_in_executor(None, _sha256_hex, data)
+            cached = await loop.run_in_executor(None, self.cache.get, digest)
+            METRICS.inc("personality_text_cache_total", result="miss" if cached is None else "hit")
+            if cached is not None:
+                return cached.split()
+        spooled = None
+        if len(data) >= SPOOL_UPLOAD_BYTES:
+            spooled = await loop.run_in_executor(None, _spool_upload, data)
+        try:
+            tokens, stats = await loop.run_in_executor(self.pdf_executor, _pdf_bytes_tokens, spooled or data,
+                                                       METRICS.enabled)
+        except Exception as e:
+            METRICS.inc("personality_stage_errors_total", stage="extract")
+            raise HTTPError(400, f"could not read PDF: {type(e).__name__}: {e}")
+        finally:
+            if spooled is not None:
+                os.remove(spooled)
+        METRICS.observe_doc(stats)
+        if digest is not None:
+            await loop.run_in_executor(self.cache_writer, self.cache.put, digest, " ".join(tokens))
+        return tokens
+
+    # A str payload is sent as-is (the Prometheus text format); anything else as JSON.
+    async def respond(self, writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+# ---------- MAIN ----------
+async def serve(host, port, max_batch_size, max_wait_ms, pdf_workers, cache, index_dir=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    predictor = PersonalityPredictor()
+    index = None
+    if index_dir:
+        try:
+            index = SimilarityIndex(index_dir, model=predictor.model)
+        except ValueError as e:
+            print(f"⚠️ /similar disabled: {e}")
+    with ProcessPoolExecutor(max_workers=pdf_workers) as pdf_executor:
+        app = PredictionServer(predictor, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                               pdf_executor=pdf_executor, cache=cache, index=index)
+        server = await app.start(host, port)
+        address = server.sockets[0].getsockname()
+        print(f"🧠 Personality predictor listening on http://{address[0]}:{address[1]}")
+        async with server:
+            await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP inference service for CV personality prediction.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--pdf-workers", type=int, default=None, help="processes for PDF parsing (default: CPU count)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="content-hash cache of cleaned PDF text")
+    parser.add_argument("--cache-max-mb", type=int, default=512)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--index-dir", default=INDEX_DIR, help="similarity index served at /similar")
+    parser.add_argument("--no-index", action="store_true")
+    parser.add_argument("--metrics", action="store_true", help="record stage metrics and serve them at /metrics")
+    args = parser.parse_args()
+    METRICS.enabled = METRICS.enabled or args.metrics
+    cache = None if args.no_cache else TextCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+    index_dir = None if args.no_index else args.index_dir
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch_size, args.max_wait_ms, args.pdf_workers, cache,
+                          index_dir))
+    except KeyboardInterrupt:
+        pass
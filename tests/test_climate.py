@@ -0,0 +1,131 @@
+import datetime as dt
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pytest
+
+import climate_http
+import climate_store
+
+# A local stand-in for the Open-Meteo APIs: each test gives it a responder
+# (query dict -> (status, headers, json body)) and reads back the queries it saw.
+
+class _Stub:
+    def __init__(self, responder):
+        self.responder = responder
+        self.queries = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+                stub.queries.append(query)
+                status, headers, body = stub.responder(query)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in {**headers, "Content-Type": "application/json",
+                                    "Content-Length": str(len(data))}.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/era5"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(responder):
+        servers.append(_Stub(responder))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.fixture
+def session(monkeypatch):
+    # No backoff sleeps; fresh pools so one test's connections don't leak into the next.
+    climate_http.reset_session()
+    monkeypatch.setattr(climate_http, "_session", climate_http.make_session(retries=3, backoff=0))
+    yield
+    climate_http.reset_session()
+
+# ------------------------------ http_get retries ------------------------------
+
+def _scripted(statuses):
+    statuses = list(statuses)
+
+    def respond(query):
+        status = statuses.pop(0) if statuses else 200
+        headers = {"Retry-After": "0"} if status == 429 else {}
+        return status, headers, {"status": status}
+    return respond
+
+@pytest.mark.parametrize("failures", [[429], [500, 502, 503], [504, 429]])
+def test_http_get_retries_429_and_5xx(stub, session, failures):
+    server = stub(_scripted(failures))
+    r = climate_http.http_get(server.url, params={"q": "x"}, timeout=5)
+    assert r.status_code == 200
+    assert len(server.queries) == len(failures) + 1
+
+def test_http_get_returns_the_last_error_once_retries_run_out(stub, session):
+    server = stub(_scripted([503] * 10))
+    r = climate_http.http_get(server.url, timeout=5)
+    assert r.status_code == 503
+    assert len(server.queries) == 4   # the first try plus three retries
+    with pytest.raises(Exception):
+        r.raise_for_status()
+
+def test_http_get_does_not_retry_client_errors(stub, session):
+    server = stub(_scripted([404]))
+    assert climate_http.http_get(server.url, timeout=5).status_code == 404
+    assert len(server.queries) == 1
+
+# ------------------------------ load_daily ------------------------------
+
+def _era5(query):
+    days = pd.date_range(query["start_date"], query["end_date"], freq="D")
+    daily = {"time": [d.strftime("%Y-%m-%d") for d in days]}
+    for i, var in enumerate(climate_store.DAILY_VARS):
+        daily[var] = [float(d.dayofyear + i) for d in days]
+    return 200, {}, {"daily": daily}
+
+def _fetched(server):
+    return [(q["start_date"], q["end_date"]) for q in server.queries]
+
+def test_load_daily_fetches_only_missing_ranges(stub, session, tmp_path, monkeypatch):
+    server = stub(_era5)
+    monkeypatch.setattr(climate_store, "STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(climate_store, "ARCHIVE_URL", server.url)
+    lat, lon = 28.61, 77.21
+
+    df = climate_store.load_daily(lat, lon, dt.date(2020, 3, 1), dt.date(2020, 3, 31))
+    assert _fetched(server) == [("2020-03-01", "2020-03-31")]
+    assert len(df) == 31 and df["temperature_2m_mean"].notna().all()
+
+    # A wider window downloads only the dates on either side of what is stored;
+    # gaps further apart than MERGE_GAP_DAYS stay separate requests.
+    server.queries.clear()
+    df = climate_store.load_daily(lat, lon, dt.date(2019, 12, 1), dt.date(2020, 6, 30))
+    assert _fetched(server) == [("2019-12-01", "2020-02-29"), ("2020-04-01", "2020-06-30")]
+    assert len(df) == (dt.date(2020, 6, 30) - dt.date(2019, 12, 1)).days + 1
+    assert df["time"].is_monotonic_increasing and df["time"].is_unique
+
+    # Everything is stored now, and a nearby coordinate in the same grid cell shares it.
+    server.queries.clear()
+    again = climate_store.load_daily(lat - 0.05, lon + 0.02, dt.date(2020, 1, 15), dt.date(2020, 5, 15))
+    assert server.queries == []
+    assert len(again) == (dt.date(2020, 5, 15) - dt.date(2020, 1, 15)).days + 1
@@ -0,0 +1,170 @@
+import asyncio
+import functools
+import json
+import os
+import random
+import tempfile
+
+import personality_server
+from personality_benchmark import write_synthetic_pdf
+from personality_predictor import PersonalityPredictor, train_model
+from personality_server import PredictionServer
+
+# PredictionServer on an ephemeral localhost port, driven with raw HTTP/1.1
+# over asyncio streams. PDF work runs on the default thread pool (no
+# pdf_executor), so the tests need no worker processes.
+
+@functools.lru_cache(maxsize=None)
+def _model():
+    return train_model()
+
+def _run(test, **options):
+    async def main():
+        app = PredictionServer(PersonalityPredictor(model=_model()), **options)
+        server = await app.start("127.0.0.1", 0)
+        try:
+            await test(server.sockets[0].getsockname()[1])
+        finally:
+            server.close()
+            await server.wait_closed()
+            app._batch_task.cancel()
+
+    asyncio.run(main())
+
+# headers with a None value are left out (Content-Length is sent by default).
+async def _request(reader, writer, method, path, body=b"", headers=None):
+    headers = {"Content-Length": str(len(body)), **(headers or {})}
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+    head += "".join(f"{name}: {value}\r\n" for name, value in headers.items() if value is not None)
+    writer.write(head.encode("latin-1") + b"\r\n" + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        response_headers[name.strip().lower()] = value.strip()
+    payload = json.loads(await reader.readexactly(int(response_headers["content-length"])))
+    return status, response_headers, payload
+
+def _multipart(name, data, filename=None, content_type="text/plain"):
+    boundary = "testboundary"
+    disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+    body = (f"--{boundary}\r\nContent-Disposition: {disposition}\r\nContent-Type: {content_type}\r\n\r\n"
+            .encode("latin-1") + data + f"\r\n--{boundary}--\r\n".encode("latin-1"))
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+def _assert_prediction(status, payload):
+    assert status == 200, payload
+    assert payload["prediction"] in _model().classes_
+    assert abs(sum(payload["probabilities"].values()) - 1) < 1e-3
+
+def test_text_json_and_multipart_payloads_share_a_connection():
+    async def test(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        text = b"team player, public speaker, loves meeting people"
+        status, headers, payload = await _request(reader, writer, "POST", "/predict", text,
+                                                  {"Content-Type": "text/plain"})
+        _assert_prediction(status, payload)
+        assert headers["connection"] == "keep-alive"
+        body = json.dumps({"text": text.decode()}).encode()
+        _assert_prediction(*(await _request(reader, writer, "POST", "/predict", body,
+                                            {"Content-Type": "application/json"}))[::2])
+        body, headers = _multipart("text", text)
+        _assert_prediction(*(await _request(reader, writer, "POST", "/predict", body, headers))[::2])
+        writer.close()
+
+    _run(test)
+
+def test_pdf_payloads_raw_multipart_and_spooled(tmp_path, monkeypatch):
+    path = tmp_path / "cv.pdf"
+    write_synthetic_pdf(str(path), 3, random.Random(0))
+    pdf = path.read_bytes()
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(uploads))
+
+    async def test(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        status, _headers, raw = await _request(reader, writer, "POST", "/predict", pdf,
+                                               {"Content-Type": "application/pdf"})
+        _assert_prediction(status, raw)
+        body, headers = _multipart("file", pdf, "cv.pdf", "application/pdf")
+        status, _headers, multipart = await _request(reader, writer, "POST", "/predict", body, headers)
+        _assert_prediction(status, multipart)
+        assert multipart["probabilities"] == raw["probabilities"]
+
+        # Uploads at or above SPOOL_UPLOAD_BYTES reach the parser through a temp file.
+        monkeypatch.setattr(personality_server, "SPOOL_UPLOAD_BYTES", 1)
+        status, _headers, spooled = await _request(reader, writer, "POST", "/predict", pdf,
+                                                   {"Content-Type": "application/pdf"})
+        _assert_prediction(status, spooled)
+        assert spooled["probabilities"] == raw["probabilities"]
+        status, _headers, payload = await _request(reader, writer, "POST", "/predict", b"%PDF-1.4 not really",
+                                                   {"Content-Type": "application/pdf"})
+        assert status == 400 and "could not read PDF" in payload["error"]
+        writer.close()
+
+    _run(test)
+    assert os.listdir(uploads) == []
+
+def test_concurrent_requests_are_scored_in_one_batch():
+    async def client(port, text):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            return await _request(reader, writer, "POST", "/predict", text, {"Content-Type": "text/plain"})
+        finally:
+            writer.close()
+
+    async def test(port):
+        texts = [b"team player", b"careful planner", b"creative artist", b"calm under pressure"]
+        responses = await asyncio.gather(*(client(port, text) for text in texts))
+        for status, _headers, payload in responses:
+            _assert_prediction(status, payload)
+            assert payload["batch_size"] == len(texts)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        status, _headers, health = await _request(reader, writer, "GET", "/health")
+        assert status == 200 and (health["batches"], health["requests"]) == (1, len(texts))
+        writer.close()
+
+    # A long wait with a full batch of 4: the batch closes as soon as all four are queued.
+    _run(test, max_batch_size=4, max_wait_ms=5000)
+
+def test_errors_keep_the_connection_unless_the_body_was_not_read():
+    async def test(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for method, path, body, headers, expected in (
+            ("POST", "/predict", b"{not json", {"Content-Type": "application/json"}, 400),
+            ("POST", "/predict", b"x", {"Content-Type": "image/png"}, 400),
+            ("GET", "/predict", b"", {}, 405),
+            ("GET", "/nowhere", b"", {}, 404),
+        ):
+            status, response_headers, payload = await _request(reader, writer, method, path, body, headers)
+            assert status == expected, payload
+            assert response_headers["connection"] == "keep-alive"
+        _assert_prediction(*(await _request(reader, writer, "POST", "/predict", b"team player",
+                                            {"Content-Type": "text/plain"}))[::2])
+        writer.close()
+
+    _run(test)
+
+def test_length_errors_close_the_connection(monkeypatch):
+    monkeypatch.setattr(personality_server, "MAX_BODY_BYTES", 16)
+
+    async def test(port):
+        for body, headers, expected in (
+            (b"team player", {"Content-Length": None}, 411),
+            (b"team player", {"Content-Length": "abc"}, 400),
+            (b"team player" * 2, {}, 413),
+        ):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            status, response_headers, _payload = await _request(
+                reader, writer, "POST", "/predict", body, {"Content-Type": "text/plain", **headers})
+            assert status == expected
+            assert response_headers["connection"] == "close"
+            assert await reader.read() == b""
+            writer.close()
+
+    _run(test)